@@ -56,11 +56,19 @@ class Config:
         # ----------------------- 文件处理配置 -----------------------
         # 支持的文件格式
         self.SUPPORTED_FILE_FORMATS = ["pdf", "docx", "txt", "pptx", "html", "ipynb"]
+        # 一次上传多个文件时同时处理的最大文件数
+        self.MAX_UPLOAD_CONCURRENCY = 4
 
         # 文本分块参数
         self.CHUNK_SIZE = 1000  # 每个文本块的最大字符数
         self.CHUNK_OVERLAP = 200  # 块之间的重叠字符数
 
+        # ----------------------- 向量库配置 -----------------------
+        # Chroma底层SQLite启用WAL日志模式 (写入数据库文件头，持久生效)
+        self.CHROMA_SQLITE_WAL = True
+        # 文档入库时每批嵌入的块数 (嵌入与写库按批流水线重叠执行)
+        self.EMBED_BATCH_SIZE = 64
+
         # ----------------------- 日志配置 -----------------------
         # 主日志文件路径
         self.LOG_FILE = self.LOG_DIR / "app.log"
@@ -163,6 +171,9 @@ class Config:
         self.SESSION_GROUP_LAST_WEEK = "前7天"
         self.SESSION_GROUP_OLDER = "更早"
 
+        # 同一界面事件允许并发处理的请求数 (异步处理器在事件循环中并发执行)
+        self.UI_CONCURRENCY_LIMIT = 8
+
     def _create_directories(self):
         """创建项目所需的所有目录"""
         dirs_to_create = [
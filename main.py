@@ -306,9 +306,7 @@ def build_app() -> gr.Blocks:
         
         # 📁 文件上传
         upload_btn.upload(
-            lambda files, phone, sid, history: (
-                FileUploadHandler.handle_file_upload(files, phone, sid, history)
-            ),
+            FileUploadHandler.handle_file_upload,
             [upload_btn, current_user, current_sid, chatbot],
             [chatbot, current_sid, session_radio],
             show_progress="full"
@@ -423,6 +421,9 @@ if __name__ == "__main__":
     logger.info("管理员密码: 123456")
     logger.info("="*50)
     
+    # 🚦 放开同一事件的并发数，多个用户的请求不再排队串行处理
+    app.queue(default_concurrency_limit=config.UI_CONCURRENCY_LIMIT)
+    
     app.launch(
         server_name="0.0.0.0",
         server_port=7890,
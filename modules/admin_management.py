@@ -23,9 +23,11 @@ import pandas as pd
 from utils.database import db_manager
 from utils.logger import logger
 from config import config
+from modules.chat_management import chat_manager
 from modules.knowledge_base_maintenance import kb_maintenance
 from modules.knowledge_base import KnowledgeBase
-from modules.system_maintenance import SystemMaintenance
+from modules.rag import rag_system
+from modules.system_maintenance import get_system_maintenance
 
 
 class AdminManager:
@@ -46,7 +48,7 @@ class AdminManager:
         # 初始化子系统
         self.kb_maintenance = kb_maintenance  # 使用增强版
         self.kb_system = KnowledgeBase()
-        self.sys_maintenance = SystemMaintenance()
+        self.sys_maintenance = get_system_maintenance()
         
         # 管理员配置
         self.admin_phone = "admin"
@@ -237,6 +239,11 @@ class AdminManager:
             conn.commit()
             conn.close()
             
+            # 🔢 会话已删除，使该用户的会话列表缓存失效，并移除缓存的会话向量集合句柄
+            chat_manager.bump_session_version(phone)
+            for (sid,) in sessions:
+                rag_system.evict_collection(sid)
+            
             return True, "用户及其所有数据已删除"
             
         except Exception as e:
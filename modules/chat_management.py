@@ -1,7 +1,11 @@
 import time
 import random
 import uuid
+import inspect
+import threading
 import datetime
+import functools
+import contextvars
 from typing import Any
 from config import config
 from utils.logger import logger
@@ -9,6 +13,37 @@ from utils.database import db_manager
 from utils.llm_utils import llm_utils
 
 
+# 🧾 请求级消息缓存 {会话ID: 消息行}：只在 request_scoped 包裹的处理器执行期间存在
+_request_messages: contextvars.ContextVar[dict[str, list] | None] = contextvars.ContextVar(
+    "request_messages", default=None
+)
+
+
+def request_scoped(func):
+    """
+    🧾 为一次界面请求开启消息缓存
+    处理器执行期间同一会话的消息只查询一次 (asyncio.to_thread 会复制上下文，线程中同样可见)
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = _request_messages.set({})
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _request_messages.reset(token)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _request_messages.set({})
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _request_messages.reset(token)
+    return wrapper
+
+
 class ChatManager:
     """
     💬 增强型聊天管理模块
@@ -28,6 +63,19 @@ class ChatManager:
 
     def __init__(self):
         logger.info("🚀 初始化增强型聊天管理模块")
+        
+        # 🔢 每个用户的会话列表版本号：会话创建/重命名/删除时递增，供会话列表缓存判断失效
+        self._session_versions: dict[str, int] = {}
+        self._version_lock = threading.Lock()
+
+    def session_version(self, phone: str) -> int:
+        """🔢 获取用户会话列表的当前版本号"""
+        return self._session_versions.get(phone, 0)
+
+    def bump_session_version(self, phone: str) -> None:
+        """🔢 用户会话列表发生变化，递增版本号使缓存失效"""
+        with self._version_lock:
+            self._session_versions[phone] = self._session_versions.get(phone, 0) + 1
 
     def create_session(self, phone: str, title: str = None) -> str:
         """
@@ -52,6 +100,8 @@ class ChatManager:
 
         # 📝 创建会话记录到数据库
         if db_manager.create_session(sid, phone, title, created):
+            self.bump_session_version(phone)
+            
             # 💬 立即添加欢迎消息到数据库
             welcome_msg = config.i18n.get('new_session_created')
             self.add_message(sid, "assistant", welcome_msg)
@@ -94,13 +144,14 @@ class ChatManager:
             logger.debug(f"💾 开始保存消息: 会话={sid_str}, 角色={role_str}, 内容长度={len(content_str)}")
                 
             success = db_manager.add_message(sid_str, role_str, content_str, datetime.datetime.now().isoformat())
+            self._invalidate_cached_messages(sid_str)
         
             if success:
                 logger.debug(f"✅ 消息已实时保存: 会话={sid_str}, 角色={role_str}")
                 
                 # 🎯 检查是否需要自动重命名会话
                 if role_str == "assistant":  # 只在AI回复后检查
-                    messages = self.get_messages(sid_str)
+                    messages = self.get_messages_cached(sid_str)
                     if len(messages) == 2:  # 第一条用户消息 + 第一条AI回复
                         logger.info(f"🔄 [AUTO_RENAME_CHECK] 会话 {sid_str} 达到重命名条件")
                         self.auto_rename_session(sid_str)
@@ -113,6 +164,37 @@ class ChatManager:
             logger.error(f"❌ 添加消息失败: {str(e)}")
             return False
 
+    def add_messages_bulk(self, messages: list[tuple[str, str, str, str]]) -> bool:
+        """
+        💾 批量保存消息到数据库（单个事务）
+        用于文件上传等一次产生多条状态消息的场景，不触发自动重命名检查
+        
+        参数:
+            messages: [(会话ID, 消息角色, 消息内容, 时间戳), ...]
+        返回:
+            是否全部成功保存
+        """
+        if not messages:
+            return True
+        
+        try:
+            saved = db_manager.add_messages_bulk([
+                (str(sid), str(role), str(content), str(ts))
+                for sid, role, content, ts in messages
+            ])
+            for sid in {str(message[0]) for message in messages}:
+                self._invalidate_cached_messages(sid)
+            if saved != len(messages):
+                logger.error(f"❌ 消息批量保存失败: 消息数={len(messages)}")
+                return False
+            
+            logger.debug(f"✅ 消息已批量保存: 消息数={saved}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ 批量添加消息失败: {str(e)}")
+            return False
+
     def get_messages(self, sid: str, limit: int = None) -> list[tuple[str, str, str]]:
         """
         📋 获取指定会话的所有消息（按时间升序）
@@ -132,6 +214,31 @@ class ChatManager:
             logger.error(f"❌ 获取消息失败: 会话={sid}, 错误={str(e)}")
             return []
 
+    def get_messages_cached(self, sid: str) -> list[tuple[str, str, str]]:
+        """
+        📋 获取会话的全部消息，在 request_scoped 请求内对同一会话只查询一次
+        
+        参数:
+            sid: 会话ID (UUID格式字符串)
+        返回:
+            消息列表 [(role, content, timestamp), ...]
+        """
+        cache = _request_messages.get()
+        if cache is None:
+            return self.get_messages(sid)
+        
+        sid_str = str(sid)
+        messages = cache.get(sid_str)
+        if messages is None:
+            messages = cache[sid_str] = self.get_messages(sid_str)
+        return messages
+
+    def _invalidate_cached_messages(self, sid: str) -> None:
+        """🧹 会话写入新消息后移除请求级缓存中的旧结果"""
+        cache = _request_messages.get()
+        if cache is not None:
+            cache.pop(sid, None)
+
     def get_all_sessions_for_user(self, phone: str) -> list[dict[str, Any]]:
         """
         📋 获取用户的所有会话完整信息，包括所有消息
@@ -191,8 +298,7 @@ class ChatManager:
         返回:
             完整的消息列表，按时间顺序排列
         """
-        sid_str = str(sid)
-        messages = db_manager.get_messages(sid_str, limit=None)
+        messages = self.get_messages_cached(sid)
         if not messages:
             return []
         
@@ -359,12 +465,14 @@ class ChatManager:
             phone: 用户手机号
         返回:
             包含所有会话信息的字典，确保UI能立即显示
+            (messages_by_sid 为 {会话ID: [(role, content, timestamp), ...]})
         """
         if not phone:
             return {
                 "sessions": [], 
                 "session_choices": [("💬 欢迎使用", "")], 
                 "default_sid": None,
+                "messages_by_sid": {},
                 "total_sessions": 0,
                 "total_messages": 0
             }
@@ -392,10 +500,17 @@ class ChatManager:
         if not session_choices and default_sid:
             session_choices = [("💬 欢迎使用", default_sid)]
         
+        # 📋 各会话消息 {会话ID: [(role, content, timestamp), ...]}，调用方无需再次查询
+        messages_by_sid = {
+            s["sid"]: [(m["role"], m["content"], m["timestamp"]) for m in s["messages"]]
+            for s in sessions
+        }
+        
         result = {
             "sessions": sessions,
             "session_choices": session_choices,
             "default_sid": default_sid,
+            "messages_by_sid": messages_by_sid,
             "total_sessions": len(sessions),
             "total_messages": sum(s["message_count"] for s in sessions)
         }
@@ -578,6 +693,11 @@ class ChatManager:
             conn.commit()
             conn.close()
             
+            # 🔢 标题变化后会话列表需要重建
+            session = db_manager.get_session(str(sid))
+            if session:
+                self.bump_session_version(session[1])
+            
             logger.info(f"🎯 [SESSION_RENAMED] 会话 {sid} 已重命名为: '{new_title}'")
             return True
             
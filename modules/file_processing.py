@@ -278,7 +278,14 @@ class FileProcessor:
             logger.error(f"❌ 文档加载失败: {file_path} - {str(e)}")
             return None
 
-    def process_file(self, sid: str, file_path: Path, file_name: str, file_type: str) -> bool:
+    def process_file(
+        self,
+        sid: str,
+        file_path: Path,
+        file_name: str,
+        file_type: str,
+        messages: list[tuple[str, str]] | None = None
+    ) -> bool:
         """
         🔄 处理单个文件 - 会话隔离版
         重要：确保文档只在指定的会话中生效
@@ -288,10 +295,18 @@ class FileProcessor:
             file_path: 文件路径
             file_name: 原始文件名
             file_type: 文件类型
+            messages: 状态消息收集列表（可选）；传入时进度/结果消息追加为 (角色, 内容)，
+                      由调用方统一保存，否则逐条写入会话
             
         返回:
             处理成功返回True，否则False
         """
+        def notify(role: str, msg: str) -> None:
+            if messages is not None:
+                messages.append((role, msg))
+            else:
+                chat_manager.add_message(sid_str, role, msg)
+
         try:
             # 🔍 严格验证UUID格式
             try:
@@ -306,13 +321,13 @@ class FileProcessor:
             
             # 💬 添加上传进度提示
             progress_msg = f"📄 正在处理文档: {file_name}..."
-            chat_manager.add_message(sid_str, "system", progress_msg)
+            notify("system", progress_msg)
 
             # 1. 📖 加载文档（带超时保护）
             documents = self.load_document(file_path, file_type)
             if documents is None:
                 error_msg = f"❌ 无法加载文档: {file_name}"
-                chat_manager.add_message(sid_str, "system", error_msg)
+                notify("system", error_msg)
                 return False
 
             # 2. ✂️ 文本分块
@@ -320,11 +335,11 @@ class FileProcessor:
                 chunks = self.text_splitter.split_documents(documents)
                 if not chunks:
                     warning_msg = f"⚠️ 文档分块为空: {file_name}"
-                    chat_manager.add_message(sid_str, "system", warning_msg)
+                    notify("system", warning_msg)
                     return False
             except Exception as e:
                 error_msg = f"❌ 文档分块失败: {file_name}"
-                chat_manager.add_message(sid_str, "system", error_msg)
+                notify("system", error_msg)
                 logger.error(f"❌ 文档分块失败: {file_name} - {str(e)}")
                 return False
 
@@ -341,7 +356,7 @@ class FileProcessor:
                 logger.info(f"✅ 向量集合已就绪: {collection_name}")
             except Exception as e:
                 error_msg = f"❌ 向量数据库连接失败"
-                chat_manager.add_message(sid_str, "system", error_msg)
+                notify("system", error_msg)
                 logger.error(f"❌ 向量数据库连接失败: {str(e)}")
                 return False
 
@@ -380,11 +395,11 @@ class FileProcessor:
                     # 📊 更新进度提示（大文件）
                     if total_chunks > 100:
                         progress_msg = f"📊 处理中... {progress:.0f}%"
-                        chat_manager.add_message(sid_str, "system", progress_msg)
+                        notify("system", progress_msg)
                 
                 # ✅ 添加成功处理消息
                 success_msg = f"✅ 文档处理完成: {file_name} ({len(chunks)} 个片段)"
-                chat_manager.add_message(sid_str, "assistant", success_msg)
+                notify("assistant", success_msg)
                 
                 logger.info(
                     f"🎉 文件处理完成: {file_name} -> {len(chunks)} 个块 "
@@ -394,13 +409,13 @@ class FileProcessor:
                 
             except Exception as e:
                 error_msg = f"❌ 向量存储失败: {file_name}"
-                chat_manager.add_message(sid_str, "system", error_msg)
+                notify("system", error_msg)
                 logger.error(f"❌ 向量存储失败: {file_name} - {str(e)}")
                 return False
 
         except Exception as e:
             error_msg = f"💥 处理出错: {file_name}"
-            chat_manager.add_message(sid_str, "system", error_msg)
+            notify("system", error_msg)
             logger.error(f"❌ 文件处理失败: {file_name} - {str(e)}")
             return False
 
@@ -1,16 +1,85 @@
 import os
-import uuid
+import sqlite3
+import hashlib
+import queue
+import functools
+import threading
 from pathlib import Path
 from langchain_community.document_loaders import (
     PyPDFLoader, Docx2txtLoader, TextLoader,
     UnstructuredPowerPointLoader, UnstructuredHTMLLoader, NotebookLoader
 )
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from config import config
 from utils.logger import logger
 from utils.llm_utils import llm_utils
+from utils.database import db_manager
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # 未安装时回退到纯Python的PyPDFLoader
+    pdfium = None
+
+
+class FastPDFLoader(BaseLoader):
+    """
+    📄 基于PDFium(C++)的PDF加载器
+    与PyPDFLoader输出格式一致 (每页一个Document，元数据含source/page)，
+    文本提取在原生代码中完成，大文件解析明显更快
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def lazy_load(self):
+        pdf = pdfium.PdfDocument(self.file_path)
+        try:
+            for page_index in range(len(pdf)):
+                page = pdf[page_index]
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+                yield Document(page_content=text, metadata={"source": self.file_path, "page": page_index})
+        finally:
+            pdf.close()
+
+
+# 🛠️ 文件类型 -> 文档加载器映射 (模块级常量，避免每次调用重建字典和lambda)
+_LOADER_MAP = {
+    "pdf": FastPDFLoader if pdfium else PyPDFLoader,
+    "docx": Docx2txtLoader,
+    "txt": functools.partial(TextLoader, encoding='utf-8'),
+    "pptx": UnstructuredPowerPointLoader,
+    "html": UnstructuredHTMLLoader,
+    "ipynb": NotebookLoader
+}
+
+# 🧩 全模块共享的文本分块器 (构造时会编译分隔符正则，复用即可)
+_TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=config.CHUNK_SIZE,
+    chunk_overlap=config.CHUNK_OVERLAP,
+    length_function=len,
+    is_separator_regex=False,
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _load_and_split(path_str: str, mtime: float) -> tuple:
+    """
+    📖 加载并分块文档
+    按 (文件路径, 修改时间) 缓存结果，文件被修改后mtime变化即自动失效
+    """
+    loader_class = _LOADER_MAP[Path(path_str).suffix[1:].lower()]
+    documents = loader_class(path_str).load()
+    return tuple(_TEXT_SPLITTER.split_documents(documents))
 
 
 class KnowledgeBase:
@@ -32,40 +101,55 @@ class KnowledgeBase:
     def __init__(self):
         logger.info("📚 初始化知识库管理模块")
         
-        # 🧩 初始化文本分块器
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHUNK_SIZE,
-            chunk_overlap=config.CHUNK_OVERLAP,
-            length_function=len,
-            is_separator_regex=False,
-        )
+        # 🧩 复用模块级文本分块器
+        self.text_splitter = _TEXT_SPLITTER
         
         # 🗄️ 初始化向量数据库客户端
         self.chroma_client = chromadb.PersistentClient(
             path=str(config.VECTOR_STORE_DIR),
             settings=Settings(allow_reset=True)
         )
+        self._tune_chroma_sqlite()
+        
+        # 🧮 嵌入函数 (显式持有，入库时可在独立线程中计算向量)
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
         
         # 📚 主知识库集合
         self.main_collection = self.chroma_client.get_or_create_collection(
             name="main_knowledge_base",
-            metadata={"hnsw:space": "cosine"}
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self.embedding_function
         )
         logger.info("✅ 知识库初始化完成")
     
+    def _tune_chroma_sqlite(self):
+        """
+        ⚙️ 调整Chroma底层SQLite的日志模式
+        WAL模式下提交只追加写WAL文件，避免每次插入都回写主库并fsync；
+        journal_mode=WAL会写入数据库文件头，对Chroma自身的连接同样生效
+        """
+        if not config.CHROMA_SQLITE_WAL:
+            return
+        
+        db_file = Path(config.VECTOR_STORE_DIR) / "chroma.sqlite3"
+        if not db_file.exists():
+            return
+        
+        try:
+            conn = sqlite3.connect(str(db_file))
+            try:
+                mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            finally:
+                conn.close()
+            logger.info(f"⚙️ Chroma SQLite日志模式: {mode}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 设置Chroma SQLite日志模式失败: {str(e)}")
+    
     def _get_loader(self, file_type: str):
         """根据文件类型获取对应的文档加载器"""
-        loader_map = {
-            "pdf": PyPDFLoader,
-            "docx": Docx2txtLoader,
-            "txt": lambda path: TextLoader(path, encoding='utf-8'),
-            "pptx": UnstructuredPowerPointLoader,
-            "html": UnstructuredHTMLLoader,
-            "ipynb": NotebookLoader
-        }
-        return loader_map.get(file_type.lower())
+        return _LOADER_MAP.get(file_type.lower())
     
-    def add_document(self, file_path: Path, metadata: dict) -> bool:
+    def add_document(self, file_path: Path, metadata: dict) -> list[str] | None:
         """
         📥 添加文档到知识库
         1. 📖 加载文档内容
@@ -77,7 +161,26 @@ class KnowledgeBase:
           file_path: 文件路径
           metadata: 元数据 (标题、作者、标签等)
         返回:
-          是否添加成功
+          本次新写入的块ID列表 (内容未变化时为空列表)，失败返回None
+        """
+        staged = self.stage_document(file_path, metadata)
+        if staged is None:
+            return None
+        if not self.commit_document(staged):
+            return None
+        return staged["new_ids"]
+    
+    def stage_document(self, file_path: Path, metadata: dict) -> dict | None:
+        """
+        📥 入库第一阶段：加载、分块并嵌入写入新增块
+        只新增块，不改动该文件已有的块、块索引和文件元数据，
+        调用方随后用 commit_document 生效，或用 discard_document 撤销
+        
+        参数:
+          file_path: 文件路径
+          metadata: 元数据 (标题、作者、标签等)
+        返回:
+          暂存结果 (传给 commit_document / discard_document)，失败返回None
         """
         try:
             logger.info(f"📥 开始添加文档到知识库: {file_path.name}")
@@ -89,49 +192,177 @@ class KnowledgeBase:
             loader_class = self._get_loader(file_type)
             if not loader_class:
                 logger.error(f"❌ 不支持的文件类型: {file_type}")
-                return False
+                return None
             
-            # 📖 加载文档
-            loader = loader_class(str(file_path))
-            documents = loader.load()
+            # 📖 加载文档并分块 (命中缓存时跳过解析)
+            chunks = _load_and_split(str(file_path), file_path.stat().st_mtime)
             
-            if not documents:
+            if not chunks:
                 logger.warning(f"⚠️ 文档内容为空: {file_path}")
-                return False
+                return None
+            
+            # 📝 准备向量数据库存储 (内容哈希ID，重复入库保持幂等)
+            ids = [
+                hashlib.sha256(f"{file_path}:{i}:{chunk.page_content}".encode("utf-8")).hexdigest()
+                for i, chunk in enumerate(chunks)
+            ]
+            
+            # 🏷️ 块元数据仅引用文件ID；这里只取得ID，已有文件的元数据留到提交阶段再更新
+            file_record = db_manager.ensure_kb_file(str(file_path), file_type.lower())
+            if file_record is None:
+                return None
+            file_id, file_created = file_record
+            
+            # 🔍 跳过已存在的块，避免重复嵌入
+            existing_ids = set(self.main_collection.get(ids=ids, include=[])['ids'])
+            new_indices = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing_ids]
+            new_ids = [ids[i] for i in new_indices]
+            
+            staged = {
+                "file_path": file_path,
+                "file_type": file_type.lower(),
+                "metadata": metadata,
+                "ids": ids,
+                "new_ids": new_ids,
+                "file_created": file_created
+            }
             
-            # ✂️ 文本分块
-            chunks = self.text_splitter.split_documents(documents)
-            
-            # 📝 准备向量数据库存储
-            ids = [str(uuid.uuid4()) for _ in chunks]
-            texts = [chunk.page_content for chunk in chunks]
-            
-            # 🏷️ 添加元数据
-            metadatas = []
-            for i, chunk in enumerate(chunks):
-                chunk_metadata = {
-                    "source": metadata.get("title", file_path.stem),
-                    "author": metadata.get("author", "unknown"),
-                    "tags": metadata.get("tags", ""),
-                    "chunk_index": i,
-                    "file_path": str(file_path),
-                    **metadata  # 包含所有自定义元数据
-                }
-                metadatas.append(chunk_metadata)
-            
-            # 🗄️ 添加到向量数据库
-            self.main_collection.add(
-                ids=ids,
-                documents=texts,
-                metadatas=metadatas
+            if new_indices:
+                texts = [chunks[i].page_content for i in new_indices]
+                metadatas = [{"chunk_index": i, "file_id": file_id} for i in new_indices]
+                
+                # 🗄️ 写入向量数据库 (upsert语义)
+                try:
+                    self._embed_and_upsert(new_ids, texts, metadatas)
+                except Exception:
+                    self.discard_document(staged)
+                    raise
+            else:
+                # ♻️ 块内容未变化，跳过嵌入
+                logger.info(f"♻️ 文档内容未变化，跳过嵌入: {file_path.name}")
+            
+            logger.info(f"✅ 文档块写入成功: {file_path.name} -> {len(chunks)}个块 (新增 {len(new_ids)} 个)")
+            return staged
+        except Exception as e:
+            logger.error(f"❌ 添加文档失败: {file_path} - {str(e)}")
+            return None
+    
+    def commit_document(self, staged: dict) -> bool:
+        """
+        ✅ 入库第二阶段：更新文件元数据，删除旧版本的过期块并替换块索引
+        
+        参数:
+          staged: stage_document 的返回结果
+        返回:
+          是否提交成功
+        """
+        file_path = staged["file_path"]
+        metadata = staged["metadata"]
+        try:
+            # 🏷️ 文件级元数据只存一份 (内容未变化时也要更新标题/作者/标签)
+            tags = metadata.get("tags", "")
+            file_id = db_manager.upsert_kb_file(
+                file_path=str(file_path),
+                file_type=staged["file_type"],
+                source=metadata.get("title", file_path.stem),
+                author=metadata.get("author", "unknown"),
+                tags=",".join(tags) if isinstance(tags, (list, tuple)) else tags,
+                extra=metadata
             )
+            if file_id is None:
+                return False
             
-            logger.info(f"✅ 文档添加成功: {file_path.name} -> {len(chunks)}个块")
+            # 🧹 文件内容变化后旧块ID不再出现，删除这些过期块，避免检索到旧内容
+            self._delete_stale_chunks(str(file_path), staged["ids"])
+            
+            # 📇 记录文件 -> 块ID索引
+            db_manager.set_kb_chunk_ids(str(file_path), staged["ids"])
+            
+            logger.info(f"✅ 文档添加成功: {file_path.name}")
             return True
         except Exception as e:
-            logger.error(f"❌ 添加文档失败: {file_path} - {str(e)}")
+            logger.error(f"❌ 提交文档失败: {file_path} - {str(e)}")
             return False
     
+    def discard_document(self, staged: dict) -> bool:
+        """
+        🔄 撤销 stage_document：删除本次新增的块，已有版本的块、索引和元数据保持不变
+        
+        参数:
+          staged: stage_document 的返回结果
+        返回:
+          是否撤销成功
+        """
+        file_path = str(staged["file_path"])
+        try:
+            if staged["new_ids"]:
+                self.main_collection.delete(ids=staged["new_ids"])
+            # 🗑️ 文件记录是本次暂存时新建的，一并删除
+            if staged["file_created"]:
+                db_manager.delete_kb_file(file_path)
+            
+            logger.info(f"🔄 已撤销暂存的知识块: {file_path} -> {len(staged['new_ids'])} 个")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 撤销暂存文档失败: {file_path} - {str(e)}")
+            return False
+    
+    def _delete_stale_chunks(self, file_path: str, current_ids: list) -> None:
+        """🧹 删除该文件已有、但不在本次入库块ID列表中的过期块 (索引中没有记录的历史文档按元数据查找)"""
+        current = set(current_ids)
+        stale_ids = [chunk_id for chunk_id in self._get_file_chunks(file_path, include=[])['ids'] if chunk_id not in current]
+        if stale_ids:
+            self.main_collection.delete(ids=stale_ids)
+            logger.info(f"🧹 删除过期知识块: {file_path} -> {len(stale_ids)} 个")
+    
+    def _embed_and_upsert(self, ids: list, texts: list, metadatas: list):
+        """
+        🔄 分批嵌入并写入向量数据库
+        嵌入线程计算第N批向量的同时，当前线程写入第N-1批，
+        两个阶段通过有界队列衔接，耗时相互重叠且内存占用可控
+        """
+        batch_size = config.EMBED_BATCH_SIZE
+        batches = queue.Queue(maxsize=2)
+        stop = threading.Event()
+        
+        def _embed_worker():
+            try:
+                for start in range(0, len(ids), batch_size):
+                    if stop.is_set():
+                        return
+                    batch_texts = texts[start:start + batch_size]
+                    embeddings = self.embedding_function(batch_texts)
+                    batches.put((ids[start:start + batch_size], batch_texts, metadatas[start:start + batch_size], embeddings))
+                batches.put(None)
+            except Exception as e:
+                batches.put(e)
+        
+        worker = threading.Thread(target=_embed_worker, name="kb-embed", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                
+                batch_ids, batch_texts, batch_metadatas, embeddings = item
+                self.main_collection.upsert(
+                    ids=batch_ids,
+                    documents=batch_texts,
+                    metadatas=batch_metadatas,
+                    embeddings=embeddings
+                )
+        finally:
+            # 🛑 写入失败时通知嵌入线程退出，并清空队列避免其阻塞在put上
+            stop.set()
+            while worker.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+    
     def delete_document(self, file_path: str) -> bool:
         """
         🗑️ 从知识库中删除文档
@@ -147,17 +378,15 @@ class KnowledgeBase:
             logger.info(f"🗑️ 开始从知识库删除文档: {file_path}")
             
             # 🔍 查找所有与该文件相关的块
-            results = self.main_collection.get(
-                where={"file_path": file_path},
-                include=["metadatas", "documents"]
-            )
+            results = self._get_file_chunks(file_path, include=[])
             
             if not results['ids']:
                 logger.warning(f"⚠️ 未找到与文件相关的知识块: {file_path}")
                 return False
             
-            # 🗑️ 删除所有相关块
+            # 🗑️ 删除所有相关块及其索引
             self.main_collection.delete(ids=results['ids'])
+            db_manager.delete_kb_file(file_path)
             
             logger.info(f"✅ 成功删除 {len(results['ids'])} 个知识块")
             return True
@@ -165,6 +394,29 @@ class KnowledgeBase:
             logger.error(f"❌ 删除文档失败: {file_path} - {str(e)}")
             return False
     
+    def _get_file_chunks(self, file_path: str, include: list) -> dict:
+        """
+        🔍 获取文件的所有块
+        优先通过块索引表按ID直接读取，索引中没有记录的历史文档回退到元数据过滤
+        """
+        chunk_ids = db_manager.get_kb_chunk_ids(file_path)
+        if chunk_ids:
+            return self.main_collection.get(ids=chunk_ids, include=include)
+        return self.main_collection.get(where={"file_path": file_path}, include=include)
+    
+    def _resolve_metadatas(self, metadatas: list) -> list:
+        """
+        🏷️ 还原块的完整元数据
+        新格式的块只保存 file_id，需要从知识库文件表合并来源、作者等字段；
+        旧格式的块自带完整元数据，原样返回
+        """
+        file_ids = {meta["file_id"] for meta in metadatas if meta and "file_id" in meta}
+        files = db_manager.get_kb_files(list(file_ids))
+        return [
+            {**files.get(meta["file_id"], {}), **meta} if meta and "file_id" in meta else meta
+            for meta in metadatas
+        ]
+    
     def query(self, question: str, top_k: int = 5) -> tuple:
         """
         🔍 知识库查询
@@ -187,27 +439,29 @@ class KnowledgeBase:
             
             # 📄 提取相关文档内容
             context_docs = results['documents'][0]
-            metadatas = results['metadatas'][0]
+            metadatas = self._resolve_metadatas(results['metadatas'][0])
             
             logger.info(f"✅ 检索到 {len(context_docs)} 条相关文档")
             
             # 📝 构建上下文字符串
-            context_str = "\n\n".join([
-                f"[📄 来源: {meta['source']}, 👤 作者: {meta.get('author', '未知')}]\n{content}"
-                for content, meta in zip(context_docs, metadatas)
-            ])
+            # 按块ID而非相关度排序：同一组块总能拼出相同的提示前缀，便于服务端前缀缓存复用
+            ordered = sorted(zip(results['ids'][0], context_docs, metadatas), key=lambda item: item[0])
+            context_str = "\n\n".join(
+                f"[📄 来源: {meta.get('source', '未知')}, 👤 作者: {meta.get('author', '未知')}]\n{content}"
+                for _, content, meta in ordered
+            )
             
-            # 🤖 使用LLM生成答案
+            # 🤖 使用LLM生成答案 (固定指令 + 上下文在前，问题在后)
             prompt = f"""
             🤖 你是一个智能知识库助手，请根据提供的上下文信息回答问题。
             如果上下文信息不足以回答问题，请如实告知。
             
-            ❓ 问题：
-            {question}
-            
             📚 上下文信息：
             {context_str}
             
+            ❓ 问题：
+            {question}
+            
             💡 请基于以上信息提供准确、完整的回答：
             """
             
@@ -232,30 +486,35 @@ class KnowledgeBase:
         try:
             logger.info(f"🔍 开始文档搜索: '{query}'")
             
-            # 🔍 在元数据中搜索
-            results = self.main_collection.get(
-                where={"$or": [
-                    {"source": {"$contains": query}},
-                    {"author": {"$contains": query}},
-                    {"tags": {"$contains": query}}
-                ]},
-                limit=top_k,
-                include=["metadatas"]
-            )
-            
-            # 📋 提取唯一文档信息
-            unique_docs = {}
-            for metadata in results['metadatas']:
-                file_path = metadata.get('file_path')
-                if file_path and file_path not in unique_docs:
-                    unique_docs[file_path] = {
-                        "source": metadata.get("source", ""),
-                        "author": metadata.get("author", ""),
-                        "tags": metadata.get("tags", ""),
-                        "file_path": file_path
-                    }
-            
-            doc_list = list(unique_docs.values())
+            # 🔍 在知识库文件表中搜索
+            unique_docs = {doc["file_path"]: doc for doc in db_manager.search_kb_files(query, top_k)}
+            
+            # 🔍 在旧格式块的元数据中搜索
+            try:
+                results = self.main_collection.get(
+                    where={"$or": [
+                        {"source": {"$contains": query}},
+                        {"author": {"$contains": query}},
+                        {"tags": {"$contains": query}}
+                    ]},
+                    limit=top_k,
+                    include=["metadatas"]
+                )
+                
+                # 📋 提取唯一文档信息
+                for metadata in results['metadatas']:
+                    file_path = metadata.get('file_path')
+                    if file_path and file_path not in unique_docs:
+                        unique_docs[file_path] = {
+                            "source": metadata.get("source", ""),
+                            "author": metadata.get("author", ""),
+                            "tags": metadata.get("tags", ""),
+                            "file_path": file_path
+                        }
+            except Exception as e:
+                logger.warning(f"⚠️ 元数据搜索失败，仅返回文件表结果: {str(e)}")
+            
+            doc_list = list(unique_docs.values())[:top_k]
             logger.info(f"✅ 文档搜索完成: 找到 {len(doc_list)} 个匹配文档")
             return doc_list
         except Exception as e:
@@ -276,13 +535,10 @@ class KnowledgeBase:
         try:
             logger.info(f"📄 获取文档块: {file_path}")
             
-            results = self.main_collection.get(
-                where={"file_path": file_path},
-                include=["documents", "metadatas"]
-            )
+            results = self._get_file_chunks(file_path, include=["documents", "metadatas"])
             
             chunks = []
-            for doc, meta in zip(results['documents'], results['metadatas']):
+            for doc, meta in zip(results['documents'], self._resolve_metadatas(results['metadatas'])):
                 chunks.append({
                     "content": doc,
                     "metadata": meta
@@ -330,9 +586,15 @@ class KnowledgeBase:
             
             count = self.main_collection.count()
             
-            # 📋 获取所有元数据
+            # 📊 块索引覆盖全部块时，直接在SQLite中分组统计
+            indexed_stats = db_manager.get_kb_statistics()
+            if indexed_stats and indexed_stats["total_chunks"] == count:
+                logger.info(f"📊 统计信息获取完成: 总块数={count}, 文档类型={len(indexed_stats['document_types'])}, 作者数={len(indexed_stats['authors'])}")
+                return indexed_stats
+            
+            # 📋 存在未索引的历史块，回退到遍历元数据
             results = self.main_collection.get(include=["metadatas"])
-            metadatas = results['metadatas']
+            metadatas = self._resolve_metadatas(results['metadatas'])
             
             # 📊 统计文档类型
             doc_types = {}
@@ -1,17 +1,218 @@
 import os
 import time
 import uuid
+import queue
 import shutil
+import atexit
 import hashlib
+import itertools
+import threading
+import contextlib
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Tuple, Optional, Any
 from datetime import datetime, timedelta
 from config import config
 from utils.logger import logger
-from utils.database import db_manager
+from utils.database import db_manager, LOW_QUALITY_THRESHOLD
 from modules.knowledge_base import KnowledgeBase
 from utils.llm_utils import llm_utils
 import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # 未安装时回退到标准库json
+    orjson = None
+
+
+def _dumps_json_line(obj: Any) -> bytes:
+    """序列化为单行UTF-8 JSON字节串并以换行结尾 (优先使用orjson)，用于追加写入JSONL"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b"\n"
+
+
+# ================================ 写入语句 ================================
+# 固定的SQL字符串，sqlite3 按语句文本缓存已编译的语句，长连接上重复执行时无需重新解析
+
+INSERT_AUDIT_SQL = """
+    INSERT INTO audit_log (
+        id, user_phone, operation, target_type, target_id, details,
+        ip_address, user_agent, timestamp, success
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_REVIEW_SQL = """
+    INSERT INTO review_queue (
+        entry_id, priority, created_at, status, comments
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+UPDATE_REVIEW_SQL = """
+    UPDATE review_queue 
+    SET reviewer_phone = ?, status = ?, reviewed_at = ?, comments = ?
+    WHERE entry_id = ?
+"""
+
+UPDATE_ENTRY_REVIEW_SQL = """
+    UPDATE knowledge_entries 
+    SET review_status = ?, reviewer = ?, review_comments = ?, reviewed_at = ?, updated_at = ?
+    WHERE id = ?
+"""
+
+INSERT_ENTRY_SQL = """
+    INSERT INTO knowledge_entries (
+        file_name, file_path, title, author, tags, description, category,
+        content_summary, quality_score, status, created_at, updated_at
+    ) VALUES (
+        :file_name, :file_path, :title, :author, :tags, :description, :category,
+        :content_summary, :quality_score, :status, :created_at, :updated_at
+    )
+"""
+
+INSERT_CONTENT_HASH_SQL = "INSERT INTO content_hashes (content_hash, entry_id) VALUES (?, ?)"
+
+DELETE_CONTENT_HASH_SQL = "DELETE FROM content_hashes WHERE entry_id = ?"
+
+PURGE_AUDIT_SQL = "DELETE FROM audit_log WHERE timestamp < ?"
+
+INSERT_DELETE_BACKUP_SQL = """
+    INSERT INTO delete_backups (entry_id, log_file, offset, length, deleted_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# ================================ 查询语句 ================================
+
+SELECT_CONTENT_HASH_SQL = "SELECT entry_id FROM content_hashes WHERE content_hash = ?"
+
+SELECT_DELETE_BACKUP_SQL = """
+    SELECT log_file, offset, length, deleted_at FROM delete_backups
+    WHERE entry_id = ? ORDER BY deleted_at DESC LIMIT 1
+"""
+
+_AUDIT_HISTORY_COLUMNS = """
+    SELECT id, user_phone, operation, target_type, target_id, details, timestamp, success
+    FROM audit_log
+"""
+AUDIT_HISTORY_SQL = _AUDIT_HISTORY_COLUMNS + " ORDER BY timestamp DESC LIMIT ?"
+AUDIT_HISTORY_BY_USER_SQL = _AUDIT_HISTORY_COLUMNS + " WHERE user_phone = ? ORDER BY timestamp DESC LIMIT ?"
+AUDIT_HISTORY_BY_OP_SQL = _AUDIT_HISTORY_COLUMNS + " WHERE operation = ? ORDER BY timestamp DESC LIMIT ?"
+AUDIT_HISTORY_BY_USER_OP_SQL = (
+    _AUDIT_HISTORY_COLUMNS + " WHERE user_phone = ? AND operation = ? ORDER BY timestamp DESC LIMIT ?"
+)
+
+# 🕒 当前时间的ISO字符串缓存: (整秒, 格式化到秒的前缀)
+_now_cache = (0, "")
+
+
+def _now_iso() -> str:
+    """当前本地时间的ISO格式字符串 (固定带微秒)，同一秒内复用已格式化的日期时间前缀"""
+    global _now_cache
+    t = time.time()
+    sec = int(t)
+    cached_sec, prefix = _now_cache
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        _now_cache = (sec, prefix)
+    return f"{prefix}.{int((t - sec) * 1e6):06d}"
+
+
+# 👤 未知用户/角色的默认权限
+_READ_ONLY = frozenset(["read"])
+
+
+def _make_permission_checker(permissions) -> Callable[[str], bool]:
+    """为角色生成专用的权限判断函数 (单权限角色直接比较，省去集合查找)"""
+    perms = frozenset(permissions)
+    if len(perms) == 1:
+        only = next(iter(perms))
+        return lambda p: p == only
+    return perms.__contains__
+
+
+_check_read_only = _make_permission_checker(_READ_ONLY)
+
+
+def _iter_chunks(path: Path, n: int = 1 << 20):
+    """按固定大小分块读取文件 (默认1MiB)，峰值内存与文件大小无关"""
+    with open(path, 'rb', buffering=n) as f:
+        while chunk := f.read(n):
+            yield chunk
+
+
+# ================================ 质量评估函数 ================================
+# 纯函数：只依赖传入的条目字典，不访问数据库和实例状态
+
+# 📊 完整性评分表：必填字段及其权重
+_COMPLETENESS_FIELDS = ("title", "author", "description")
+_COMPLETENESS_WEIGHTS = np.array([0.33, 0.33, 0.33])
+
+# 📊 预评估评分表：基础分 + 各元数据字段权重
+_PRE_ASSESS_BASE = 0.5
+_PRE_ASSESS_FIELDS = ("title", "author", "description", "tags")
+_PRE_ASSESS_WEIGHTS = np.array([0.2, 0.1, 0.1, 0.1])
+
+# 🎯 综合评分权重: 完整性30% + 准确性30% + 用户互动20% + 技术质量20%
+_DIMENSION_WEIGHTS = np.array([0.3, 0.3, 0.2, 0.2])
+
+
+def _field_mask(entries: List[Dict[str, Any]], fields: Tuple[str, ...]) -> np.ndarray:
+    """把条目列表编码为 N×len(fields) 的字段存在矩阵"""
+    return np.array(
+        [[bool(entry.get(field)) for field in fields] for entry in entries],
+        dtype=np.float64
+    ).reshape(len(entries), len(fields))
+
+
+def _assess_completeness(entry: Dict[str, Any]) -> float:
+    """评估内容完整性"""
+    return float(_assess_completeness_batch([entry])[0])
+
+
+def _assess_completeness_batch(entries: List[Dict[str, Any]]) -> np.ndarray:
+    """批量评估内容完整性 (一次矩阵乘法完成)"""
+    return np.minimum(_field_mask(entries, _COMPLETENESS_FIELDS) @ _COMPLETENESS_WEIGHTS, 1.0)
+
+
+def _assess_accuracy(entry: Dict[str, Any]) -> float:
+    """评估内容准确性"""
+    # 这里可以实现更复杂的准确性检查
+    return 0.8
+
+
+def _assess_engagement(entry: Dict[str, Any]) -> float:
+    """评估用户互动"""
+    # 基于访问量和反馈评估
+    return 0.7
+
+
+def _assess_technical_quality(entry: Dict[str, Any]) -> float:
+    """评估技术质量"""
+    # 基于文件类型和内容评估
+    return 0.9
+
+
+def _evaluate_row_pure(entry: Dict[str, Any]) -> float:
+    """基于已加载的条目字典计算综合评分"""
+    return float(_evaluate_rows([entry])[0])
+
+
+def _evaluate_rows(entries: List[Dict[str, Any]]) -> np.ndarray:
+    """批量计算综合评分：各维度得分组成 N×4 矩阵后与权重向量相乘"""
+    scores = np.empty((len(entries), 4))
+    scores[:, 0] = _assess_completeness_batch(entries)
+    scores[:, 1:] = [
+        (_assess_accuracy(entry), _assess_engagement(entry), _assess_technical_quality(entry))
+        for entry in entries
+    ] or np.empty((0, 3))
+    return scores @ _DIMENSION_WEIGHTS
+
+
+def _pre_assess_score(metadata: Dict[str, Any]) -> float:
+    """基于元数据完整性的预评估评分"""
+    score = _PRE_ASSESS_BASE + _field_mask([metadata], _PRE_ASSESS_FIELDS)[0] @ _PRE_ASSESS_WEIGHTS
+    return float(min(score, 1.0))
 
 
 class KnowledgeBaseMaintenance:
@@ -64,12 +265,31 @@ class KnowledgeBaseMaintenance:
             }
         }
         
+        # ⚡ 角色 -> 权限集合 (frozenset，权限判断为O(1)哈希查找)
+        self._role_perm_sets = {
+            role: frozenset(info["permissions"]) for role, info in self.role_permissions.items()
+        }
+        self._role_checkers: Dict[str, Callable[[str], bool]] = {
+            role: _make_permission_checker(perms) for role, perms in self._role_perm_sets.items()
+        }
+        
+        # 🕒 用户角色缓存: 手机号 -> (过期时间, 角色)，30秒内重复鉴权不再查库
+        self._perm_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._perm_cache_ttl = 30
+        self._perm_cache_maxsize = 10000
+        
+        # 🕒 条目权限缓存: 条目ID -> (过期时间, 允许的角色集合)，set_access_permission 时失效
+        self._entry_perm_cache: Dict[int, Tuple[float, frozenset]] = {}
+        
+        # 👥 审核员名单 (启动时加载一次，变更后调用 reload_reviewers)
+        self._reviewers = frozenset(self._get_reviewers_list())
+        
         # 📋 审核流程配置
         self.review_process = {
             "auto_approve_threshold": 0.85,  # 自动通过阈值
             "review_timeout_hours": 24,      # 审核超时时间
             "required_reviewers": 1,         # 最少审核人数
-            "quality_threshold": 0.7         # 质量评估阈值
+            "quality_threshold": LOW_QUALITY_THRESHOLD  # 质量评估阈值
         }
         
         # 🗄️ 备份配置
@@ -87,95 +307,253 @@ class KnowledgeBaseMaintenance:
             "log_retention_days": 90         # 日志保留天数
         }
         
-        # 🎯 初始化系统
-        self._init_review_queue()
+        # 📝 待写入的审计日志 (后台线程批量落库)
+        self._audit_queue = queue.Queue()
+        self._audit_flush_lock = threading.Lock()
+        self._audit_wakeup = threading.Event()  # 积压达到批量阈值时提前唤醒写入线程
+        self._audit_batch_size = 64
+        self._audit_ids = itertools.count(1)  # 建表时按现有最大ID重新设定
+        
+        # ✍️ 专用写连接 + 互斥锁：所有写操作在进程内排队，避免多线程争抢写锁触发 SQLITE_BUSY
+        self._write_conn = db_manager.get_connection()
+        self._write_lock = threading.Lock()
+        
+        # 📖 读连接池：读操作复用已打开的连接 (WAL下读写互不阻塞)
+        self._conn_pool = queue.Queue(maxsize=8)
+        self._conn_generation = 0  # 数据库文件被替换后递增，此前借出的连接归还时直接关闭
+        
+        # 🗃️ 删除备份日志：所有删除记录追加到同一个JSONL分段文件，超过上限后滚动到新分段
+        self._backup_dir = config.BASE_DIR / "kb_backups" / "deletes"
+        self._backup_lock = threading.Lock()
+        self._backup_fh = None
+        self._backup_max_bytes = 100 * 1024 * 1024
+        
+        # 🧵 后台任务线程池：提交审核、通知等不必阻塞请求线程的后续处理
+        self._background_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="kb-post")
+        
+        # 🎯 初始化系统 (所有建表语句共用一个连接，在同一事务内提交)
+        self._init_schema()
         self._init_backup_system()
-        self._init_audit_system()
+        
+        # 🧵 启动审计日志批量写入线程，进程退出前再补写一次
+        threading.Thread(target=self._audit_flusher, name="kb-audit-flusher", daemon=True).start()
+        atexit.register(self.flush_audit_log)
         
         logger.info("✅ 知识库维护系统初始化完成")
 
     # ================================ 系统初始化功能 ================================
 
-    def _init_review_queue(self):
-        """初始化审核队列系统"""
+    @contextlib.contextmanager
+    def _acquire(self):
+        """从读连接池借出一个连接，用完归还 (池空时新建，池满或数据库已被替换时关闭)"""
+        generation = self._conn_generation
         try:
-            # 🗄️ 创建审核队列表
+            conn = self._conn_pool.get_nowait()
+        except queue.Empty:
             conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS review_queue (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    entry_id INTEGER NOT NULL,
-                    reviewer_phone TEXT,
-                    status TEXT CHECK(status IN ('pending', 'in_review', 'approved', 'rejected', 'expired')),
-                    priority INTEGER DEFAULT 5,
-                    created_at TEXT NOT NULL,
-                    assigned_at TEXT,
-                    reviewed_at TEXT,
-                    comments TEXT,
-                    quality_score REAL,
-                    FOREIGN KEY(entry_id) REFERENCES knowledge_entries(id)
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_review_queue_status ON review_queue(status)
-            """)
-            
-            conn.commit()
-            conn.close()
-            logger.info("✅ 审核队列系统初始化完成")
+        try:
+            yield conn
+        finally:
+            if generation != self._conn_generation:
+                conn.close()
+            else:
+                try:
+                    self._conn_pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+
+    @contextlib.contextmanager
+    def suspended_connections(self):
+        """
+        🔌 暂停数据库连接：关闭写连接并清空读连接池，退出时在新的数据库文件上重新打开写连接
+        供恢复备份等替换数据库目录的操作使用，期间的写操作排队等待
+        """
+        with self._write_lock:
+            self._conn_generation += 1
+            self._write_conn.close()
+            while True:
+                try:
+                    self._conn_pool.get_nowait().close()
+                except queue.Empty:
+                    break
+            try:
+                yield
+            finally:
+                self._write_conn = db_manager.get_connection()
+                logger.info("🔌 知识库维护数据库连接已重新打开")
+
+    @contextlib.contextmanager
+    def _writer(self):
+        """获取专用写连接 (持锁期间独占)，正常退出时提交，异常时回滚"""
+        with self._write_lock:
+            try:
+                yield self._write_conn
+                self._write_conn.commit()
+            except Exception:
+                self._write_conn.rollback()
+                raise
+
+    def _init_schema(self):
+        """在单个事务内创建维护系统所需的全部表和索引"""
+        try:
+            conn = db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                
+                self._init_review_queue(cursor)
+                self._init_content_hash_index(cursor)
+                self._init_audit_system(cursor)
+                self._init_backup_index(cursor)
+                
+                conn.commit()
+                logger.info("✅ 审核队列、内容哈希索引、审计系统、删除备份索引初始化完成")
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
             
         except Exception as e:
-            logger.error(f"❌ 审核队列初始化失败: {str(e)}")
+            logger.error(f"❌ 维护系统数据表初始化失败: {str(e)}")
+
+    def _init_review_queue(self, cursor):
+        """初始化审核队列系统"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS review_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entry_id INTEGER NOT NULL,
+                reviewer_phone TEXT,
+                status TEXT CHECK(status IN ('pending', 'in_review', 'approved', 'rejected', 'expired')),
+                priority INTEGER DEFAULT 5,
+                created_at TEXT NOT NULL,
+                assigned_at TEXT,
+                reviewed_at TEXT,
+                comments TEXT,
+                quality_score REAL,
+                FOREIGN KEY(entry_id) REFERENCES knowledge_entries(id)
+            )
+        """)
+        
+        # 🎯 复合索引：按状态过滤后直接按 (优先级降序, 创建时间升序) 取首行，无需排序
+        # (单列 status 索引是它的前缀，已冗余)
+        cursor.execute("DROP INDEX IF EXISTS idx_review_queue_status")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_review_pri ON review_queue(status, priority DESC, created_at ASC)
+        """)
+
+    def _init_content_hash_index(self, cursor):
+        """初始化内容哈希去重表"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS content_hashes (
+                content_hash TEXT PRIMARY KEY,
+                entry_id INTEGER NOT NULL
+            )
+        """)
+        # 🗑️ 硬删除条目时按 entry_id 清理哈希行 (未开启外键，不能依赖 ON DELETE CASCADE)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_content_hash_entry ON content_hashes(entry_id)")
+
+    def _init_backup_index(self, cursor):
+        """初始化删除备份索引表 (条目ID -> 备份日志中的位置)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS delete_backups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entry_id INTEGER NOT NULL,
+                log_file TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                deleted_at TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_delete_backups_entry ON delete_backups(entry_id, deleted_at)
+        """)
 
     def _init_backup_system(self):
         """初始化备份系统"""
         try:
-            backup_dir = config.BASE_DIR / "kb_backups"
-            backup_dir.mkdir(exist_ok=True)
-            logger.info(f"✅ 备份目录创建完成: {backup_dir}")
+            self._backup_dir.mkdir(parents=True, exist_ok=True)
+            
+            # 📂 续写最新的未满分段，否则新开一个
+            segments = sorted(self._backup_dir.glob("deletes_*.jsonl"))
+            if segments and segments[-1].stat().st_size < self._backup_max_bytes:
+                self._open_backup_segment(segments[-1])
+            else:
+                self._open_backup_segment()
+            atexit.register(self._close_backup_segment)
+            
+            logger.info(f"✅ 备份目录创建完成: {self._backup_dir}")
             
         except Exception as e:
             logger.error(f"❌ 备份系统初始化失败: {str(e)}")
 
-    def _init_audit_system(self):
-        """初始化审计系统"""
-        try:
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
+    def _open_backup_segment(self, path: Path = None):
+        """打开 (追加模式) 删除备份日志分段，调用方持有 _backup_lock 或处于初始化阶段"""
+        if path is None:
+            path = self._backup_dir / f"deletes_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+        self._backup_fh = open(path, 'ab')
+        self._backup_path = path
+
+    def _close_backup_segment(self):
+        """落盘并关闭当前备份日志分段"""
+        with self._backup_lock:
+            if self._backup_fh:
+                self._backup_fh.flush()
+                os.fsync(self._backup_fh.fileno())
+                self._backup_fh.close()
+                self._backup_fh = None
+
+    def _init_audit_system(self, cursor):
+        """初始化审计系统 (按 (timestamp, id) 聚簇存储，追加写入始终落在B树末端)"""
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'audit_log'")
+        row = cursor.fetchone()
+        legacy = row is not None and "WITHOUT ROWID" not in row[0].upper()
+        if legacy:
+            cursor.execute("ALTER TABLE audit_log RENAME TO audit_log_legacy")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS audit_log (
+                timestamp TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                user_phone TEXT,
+                operation TEXT,
+                target_type TEXT,
+                target_id TEXT,
+                details TEXT,
+                ip_address TEXT,
+                user_agent TEXT,
+                success BOOLEAN,
+                error_message TEXT,
+                PRIMARY KEY (timestamp, id)
+            ) WITHOUT ROWID
+        """)
+        
+        if legacy:
+            # 🔄 迁移旧版自增主键表 (旧表上的索引随旧表一并删除)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS audit_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_phone TEXT,
-                    operation TEXT,
-                    target_type TEXT,
-                    target_id TEXT,
-                    details TEXT,
-                    ip_address TEXT,
-                    user_agent TEXT,
-                    timestamp TEXT NOT NULL,
-                    success BOOLEAN,
-                    error_message TEXT
+                INSERT INTO audit_log (
+                    timestamp, id, user_phone, operation, target_type, target_id, details,
+                    ip_address, user_agent, success, error_message
                 )
+                SELECT timestamp, id, user_phone, operation, target_type, target_id, details,
+                       ip_address, user_agent, success, error_message
+                FROM audit_log_legacy
             """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_log(user_phone)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log(timestamp)
-            """)
-            
-            conn.commit()
-            conn.close()
-            logger.info("✅ 审计系统初始化完成")
-            
-        except Exception as e:
-            logger.error(f"❌ 审计系统初始化失败: {str(e)}")
+            cursor.execute("DROP TABLE audit_log_legacy")
+            logger.info("🔧 审计日志表已迁移为 (timestamp, id) 聚簇存储")
+        
+        # 🔍 按用户/操作类型筛选后直接按时间倒序取前N条 (单列 user_phone 索引已被替代)
+        cursor.execute("DROP INDEX IF EXISTS idx_audit_user")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_audit_user_ts ON audit_log(user_phone, timestamp DESC)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_audit_op_ts ON audit_log(operation, timestamp DESC)
+        """)
+        
+        # 🔢 主键不再自增，由进程内计数器从现有最大ID之后继续分配
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM audit_log")
+        self._audit_ids = itertools.count(cursor.fetchone()[0] + 1)
 
     # ================================ 知识库内容更新功能 ================================
 
@@ -217,14 +595,15 @@ class KnowledgeBaseMaintenance:
             if not metadata.get("title"):
                 return False, {"error": "标题不能为空"}
             
-            # 📋 文件验证
-            file_size = file_path.stat().st_size
-            if file_size > 50 * 1024 * 1024:  # 50MB限制
+            # 📋 文件验证 (先按stat结果拒绝超大文件，不读取内容)
+            if file_path.stat().st_size > 50 * 1024 * 1024:  # 50MB限制
                 return False, {"error": "文件大小超过50MB限制"}
             
-            # 🔍 内容重复检查
-            if self._check_duplicate_content(file_path):
-                return False, {"error": "内容已存在，疑似重复"}
+            # 🔍 内容重复检查 (哈希与字节数在同一次读取中得到)
+            content_hash, file_size = self._scan_file(file_path)
+            duplicate_id = self._check_duplicate_content(content_hash)
+            if duplicate_id is not None:
+                return False, {"error": "内容已存在，疑似重复", "entry_id": duplicate_id}
             
             # 📊 内容质量预评估
             quality_score = self._pre_assess_quality(file_path, metadata)
@@ -233,6 +612,7 @@ class KnowledgeBaseMaintenance:
             content_summary = self._generate_content_summary(file_path)
             
             # 📋 创建知识条目记录
+            now = _now_iso()
             entry_data = {
                 "file_name": file_path.name,
                 "file_path": str(file_path),
@@ -241,27 +621,33 @@ class KnowledgeBaseMaintenance:
                 "tags": ",".join(metadata.get("tags", [])),
                 "description": metadata.get("description", ""),
                 "category": metadata.get("category", "general"),
-                "keywords": ",".join(metadata.get("keywords", [])),
                 "content_summary": content_summary,
-                "file_size": file_size,
                 "quality_score": quality_score,
                 "status": "pending",
-                "created_by": user_phone or "system",
-                "created_at": datetime.now().isoformat()
+                "created_at": now,
+                "updated_at": now
             }
             
-            # 📝 添加到数据库
-            entry_id = db_manager.add_knowledge_entry(**entry_data)
-            if not entry_id:
-                return False, {"error": "数据库操作失败"}
-            
-            # 📋 添加到知识库系统
-            kb_success = self.kb.add_document(file_path, metadata)
-            if not kb_success:
-                # 🔄 回滚数据库记录
-                db_manager.delete_knowledge_entry(entry_id)
+            # 📋 先把新增块写入向量库 (其内部会经其他连接写 kb_files，不能在持有写事务时调用)
+            #    只新增块，同路径旧版本的块、块索引和文件元数据在条目提交后才替换
+            staged = self.kb.stage_document(file_path, metadata)
+            if staged is None:
                 return False, {"error": "知识库添加失败"}
             
+            # 📝 条目记录与内容哈希在同一事务内写入，任一失败整体回滚
+            try:
+                with self._writer() as conn:
+                    entry_id = conn.execute(INSERT_ENTRY_SQL, entry_data).lastrowid
+                    conn.execute(INSERT_CONTENT_HASH_SQL, (content_hash, entry_id))
+            except Exception:
+                # 🔄 补偿：撤销本次新增的块，旧版本保持原样
+                self.kb.discard_document(staged)
+                raise
+            
+            # ✅ 条目已提交，替换文件元数据与块索引并清理旧版本的过期块
+            if not self.kb.commit_document(staged):
+                logger.warning(f"⚠️ 知识库元数据更新失败，下次重新入库时补齐: {file_path}")
+            
             # 📋 记录操作日志
             self._log_operation(
                 user_phone=user_phone,
@@ -278,7 +664,7 @@ class KnowledgeBaseMaintenance:
                 status = "approved"
                 review_required = False
             else:
-                self._submit_for_review(entry_id, user_phone)
+                self._background_pool.submit(self._submit_for_review_background, entry_id, user_phone)
                 status = "pending"
                 review_required = True
             
@@ -287,6 +673,7 @@ class KnowledgeBaseMaintenance:
                 "entry_id": entry_id,
                 "status": status,
                 "quality_score": quality_score,
+                "file_size": file_size,
                 "review_required": review_required,
                 "estimated_review_time": self._estimate_review_time(quality_score),
                 "operation_id": operation_id,
@@ -351,11 +738,11 @@ class KnowledgeBaseMaintenance:
                 "updated_data": updates,
                 "reason": reason,
                 "updated_by": user_phone or "system",
-                "updated_at": datetime.now().isoformat()
+                "updated_at": _now_iso()
             }
             
             # 📝 执行更新
-            success = db_manager.update_knowledge_content(entry_id, json.dumps(updates))
+            success = db_manager.update_knowledge_fields(entry_id, updates)
             if not success:
                 return False, {"error": "数据库更新失败"}
             
@@ -373,7 +760,7 @@ class KnowledgeBaseMaintenance:
             )
             
             # 🔄 提交重新审核
-            self._submit_for_review(entry_id, user_phone, is_update=True)
+            self._background_pool.submit(self._submit_for_review_background, entry_id, user_phone, True)
             
             result = {
                 "entry_id": entry_id,
@@ -448,6 +835,10 @@ class KnowledgeBaseMaintenance:
                 # 🗑️ 硬删除：从知识库和数据库删除
                 self.kb.delete_document(existing_entry["file_path"])
                 success = db_manager.delete_knowledge_entry(entry_id)
+                if success:
+                    # 释放内容哈希，相同文件之后可以重新上传
+                    with self._writer() as conn:
+                        conn.execute(DELETE_CONTENT_HASH_SQL, (entry_id,))
             
             # 📋 记录操作日志
             self._log_operation(
@@ -512,6 +903,23 @@ class KnowledgeBaseMaintenance:
             logger.error(f"❌ 提交审核失败: {str(e)}")
             return False, str(e)
 
+    def _submit_for_review_background(self, entry_id: int, user_phone: str = None, is_update: bool = False):
+        """后台线程：提交审核，失败时记入审计日志"""
+        try:
+            success, message = self._submit_for_review(entry_id, user_phone, is_update=is_update)
+        except Exception as e:
+            success, message = False, str(e)
+        
+        if not success:
+            self._log_operation(
+                user_phone=user_phone,
+                operation="submit_for_review",
+                target_type="knowledge_entry",
+                target_id=str(entry_id),
+                details=message,
+                success=False
+            )
+
     def _submit_for_review(
         self, 
         entry_id: int, 
@@ -527,24 +935,15 @@ class KnowledgeBaseMaintenance:
             if not entry:
                 return False, "知识条目不存在"
             
-            # 📋 创建审核记录
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO review_queue (
-                    entry_id, priority, created_at, status, notes
-                ) VALUES (?, ?, ?, ?, ?)
-            """, (
-                entry_id, 
-                priority, 
-                datetime.now().isoformat(), 
-                "pending", 
-                notes or f"{'更新' if is_update else '新增'}提交"
-            ))
-            
-            conn.commit()
-            conn.close()
+            # 📋 创建审核记录 (提交备注写入 comments 列)
+            with self._writer() as conn:
+                conn.execute(INSERT_REVIEW_SQL, (
+                    entry_id, 
+                    priority, 
+                    _now_iso(), 
+                    "pending", 
+                    notes or f"{'更新' if is_update else '新增'}提交"
+                ))
             
             # 📧 通知审核人员
             self._notify_reviewers(entry_id, priority)
@@ -556,6 +955,50 @@ class KnowledgeBaseMaintenance:
             logger.error(f"❌ 提交审核失败: {str(e)}")
             return False, str(e)
 
+    def claim_next_review_item(self, reviewer_phone: str) -> Optional[Dict[str, Any]]:
+        """
+        📥 领取下一个待审核任务 (优先级最高、提交最早者优先)
+        
+        参数:
+            reviewer_phone: 审核者手机号
+            
+        返回:
+            审核任务信息，队列为空时返回 None
+        """
+        try:
+            # 🔒 查询与领取在同一写事务内完成，避免多个审核员领到同一任务
+            with self._writer() as conn:
+                row = conn.execute("""
+                    SELECT id, entry_id, priority, created_at, comments
+                    FROM review_queue
+                    WHERE status = 'pending'
+                    ORDER BY priority DESC, created_at ASC
+                    LIMIT 1
+                """).fetchone()
+                if not row:
+                    return None
+                
+                assigned_at = _now_iso()
+                conn.execute(
+                    "UPDATE review_queue SET status = 'in_review', reviewer_phone = ?, assigned_at = ? WHERE id = ?",
+                    (reviewer_phone, assigned_at, row[0])
+                )
+            
+            logger.info(f"📥 审核任务已领取: 条目 {row[1]} -> 审核人 {reviewer_phone}")
+            return {
+                "id": row[0],
+                "entry_id": row[1],
+                "priority": row[2],
+                "created_at": row[3],
+                "comments": row[4],
+                "reviewer_phone": reviewer_phone,
+                "assigned_at": assigned_at
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ 领取审核任务失败: {str(e)}")
+            return None
+
     def review_knowledge(
         self, 
         entry_id: int, 
@@ -656,6 +1099,83 @@ class KnowledgeBaseMaintenance:
             logger.error(f"❌ 审核知识条目失败: {operation_id} - {str(e)}")
             return False, {"error": str(e)}
 
+    def review_knowledge_bulk(
+        self, 
+        entry_ids: List[int], 
+        reviewer_phone: str, 
+        approved: bool, 
+        comments: str = ""
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        ✅ 批量审核知识条目 (同一审核结论，单个事务内完成)
+        
+        参数:
+            entry_ids: 条目ID列表
+            reviewer_phone: 审核者手机号
+            approved: 是否通过
+            comments: 审核意见
+            
+        返回:
+            (成功状态, 审核结果)
+        """
+        operation_id = str(uuid.uuid4())
+        start_time = datetime.now()
+        
+        try:
+            logger.info(f"✅ 开始批量审核知识条目: {operation_id} -> {len(entry_ids)} 个")
+            
+            # 🔍 检查审核权限
+            if not self._check_review_permission(reviewer_phone):
+                return False, {"error": "无审核权限"}
+            
+            status = "approved" if approved else "rejected"
+            now = _now_iso()
+            
+            # 📝 条目审核信息与审核队列在同一事务内批量更新
+            with self._writer() as conn:
+                updated = conn.executemany(
+                    UPDATE_ENTRY_REVIEW_SQL,
+                    [(status, reviewer_phone, comments, now, now, entry_id) for entry_id in entry_ids]
+                ).rowcount
+                self._update_review_queue_bulk(
+                    conn, [(reviewer_phone, status, now, comments, entry_id) for entry_id in entry_ids]
+                )
+            
+            for entry_id in entry_ids:
+                self._log_operation(
+                    user_phone=reviewer_phone,
+                    operation="review_knowledge",
+                    target_type="knowledge_entry",
+                    target_id=str(entry_id),
+                    details=f"批量审核结果: {status}, 意见: {comments}",
+                    success=True
+                )
+                self._notify_submitter(entry_id, status, comments)
+            
+            result = {
+                "entry_ids": entry_ids,
+                "status": status,
+                "updated": updated,
+                "operation_id": operation_id,
+                "processing_time": (datetime.now() - start_time).total_seconds()
+            }
+            
+            logger.info(f"✅ 批量审核完成: {operation_id} -> 更新 {updated} 个条目")
+            return True, result
+            
+        except Exception as e:
+            self._log_operation(
+                user_phone=reviewer_phone,
+                operation="review_knowledge",
+                target_type="knowledge_entry",
+                target_id=operation_id,
+                details=str(e),
+                success=False
+            )
+            
+            logger.error(f"❌ 批量审核知识条目失败: {operation_id} - {str(e)}")
+            return False, {"error": str(e)}
+
     def evaluate_quality(self, entry_id: int) -> float:
         """
         📊 综合质量评估
@@ -672,27 +1192,7 @@ class KnowledgeBaseMaintenance:
             if not entry:
                 return 0.0
             
-            # 🎯 多维度评估
-            scores = []
-            
-            # 1. 内容完整性评分
-            completeness_score = self._assess_completeness(entry)
-            scores.append(completeness_score * 0.3)
-            
-            # 2. 内容准确性评分
-            accuracy_score = self._assess_accuracy(entry)
-            scores.append(accuracy_score * 0.3)
-            
-            # 3. 用户互动评分
-            engagement_score = self._assess_engagement(entry_id)
-            scores.append(engagement_score * 0.2)
-            
-            # 4. 技术质量评分
-            technical_score = self._assess_technical_quality(entry)
-            scores.append(technical_score * 0.2)
-            
-            # 📊 计算综合评分
-            final_score = sum(scores)
+            final_score = _evaluate_row_pure(entry)
             
             logger.info(f"📊 质量评估完成: 条目 {entry_id} -> 评分: {final_score:.2f}")
             return final_score
@@ -706,26 +1206,36 @@ class KnowledgeBaseMaintenance:
         logger.info("🤖 开始自动质量检查任务")
         
         try:
-            # 📋 获取所有已批准的知识条目
-            entries = db_manager.get_knowledge_entries(status="approved")
+            # 📋 只取从未评估过、或评估后又被修改的已批准条目，在内存中逐行评分
+            entries = db_manager.get_stale_quality_entries()
+            checked_at = _now_iso()
+            
+            # 💾 单个事务内批量回写评分和评估时间
+            with self._writer() as conn:
+                conn.executemany(
+                    "UPDATE knowledge_entries SET quality_score = ?, last_quality_check = ? WHERE id = ?",
+                    [
+                        (float(score), checked_at, entry["id"])
+                        for entry, score in zip(entries, _evaluate_rows(entries))
+                    ]
+                )
             
-            low_quality_entries = []
-            for entry in entries:
-                quality_score = self.evaluate_quality(entry["id"])
-                
-                if quality_score < self.review_process["quality_threshold"]:
-                    low_quality_entries.append({
-                        "entry_id": entry["id"],
-                        "title": entry["title"],
-                        "score": quality_score,
-                        "issues": self._identify_quality_issues(entry)
-                    })
+            # 🔍 低质量条目由部分索引直接定位
+            low_quality_entries = [
+                {
+                    "entry_id": entry["id"],
+                    "title": entry["title"],
+                    "score": entry["quality_score"],
+                    "issues": self._identify_quality_issues(entry)
+                }
+                for entry in db_manager.get_low_quality_entries()
+            ]
             
             # 📧 通知管理员
             if low_quality_entries:
                 self._notify_low_quality_entries(low_quality_entries)
             
-            logger.info(f"✅ 自动质量检查完成: 发现问题条目 {len(low_quality_entries)} 个")
+            logger.info(f"✅ 自动质量检查完成: 评估 {len(entries)} 个条目，发现问题条目 {len(low_quality_entries)} 个")
             
         except Exception as e:
             logger.error(f"❌ 自动质量检查失败: {str(e)}")
@@ -774,6 +1284,7 @@ class KnowledgeBaseMaintenance:
             
             # 📝 更新权限
             success = db_manager.set_knowledge_permissions(entry_id, valid_roles)
+            self._entry_perm_cache.pop(entry_id, None)
             if not success:
                 return False, "更新权限失败"
             
@@ -805,29 +1316,75 @@ class KnowledgeBaseMaintenance:
             权限列表
         """
         try:
-            # 📋 获取用户角色
-            user = db_manager.get_user(user_phone)
-            if not user:
-                return ["read"]  # 默认只读权限
-            
-            # 🎯 根据手机号确定角色
-            if user_phone == "admin":
-                role = "admin"
-            elif user_phone in self._get_reviewers_list():
-                role = "reviewer"
-            else:
-                role = "user"
-            
-            # 📋 获取权限
-            permissions = self.role_permissions.get(role, {}).get("permissions", ["read"])
-            
-            logger.debug(f"👤 获取用户权限: {user_phone} -> {role} -> {permissions}")
-            return permissions
+            return sorted(self._get_user_permission_set(user_phone))
             
         except Exception as e:
             logger.error(f"❌ 获取用户权限失败: {str(e)}")
             return ["read"]
 
+    def _get_user_permission_set(self, user_phone: str) -> frozenset:
+        """获取用户权限集合"""
+        return self._role_perm_sets.get(self._get_user_role(user_phone), _READ_ONLY)
+
+    def _has_permission(self, user_phone: str, permission: str) -> bool:
+        """使用用户角色的专用判断函数检查权限"""
+        return self._role_checkers.get(self._get_user_role(user_phone), _check_read_only)(permission)
+
+    def _get_user_role(self, user_phone: str) -> Optional[str]:
+        """获取用户角色 (结果缓存30秒，用户不存在时为None)"""
+        now = time.monotonic()
+        cached = self._perm_cache.get(user_phone)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        role = self._resolve_user_role(user_phone)
+        
+        if len(self._perm_cache) >= self._perm_cache_maxsize:
+            self._perm_cache.clear()
+        self._perm_cache[user_phone] = (now + self._perm_cache_ttl, role)
+        return role
+
+    def _get_entry_permissions(self, entry_id: int) -> frozenset:
+        """获取条目允许访问的角色集合 (结果缓存30秒)"""
+        now = time.monotonic()
+        cached = self._entry_perm_cache.get(entry_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        roles = frozenset(db_manager.get_knowledge_permissions(entry_id))
+        
+        if len(self._entry_perm_cache) >= self._perm_cache_maxsize:
+            self._entry_perm_cache.clear()
+        self._entry_perm_cache[entry_id] = (now + self._perm_cache_ttl, roles)
+        return roles
+
+    def invalidate_permission_cache(self):
+        """清空用户角色缓存 (角色或审核员名单变化后调用)"""
+        self._perm_cache.clear()
+
+    def reload_reviewers(self):
+        """重新加载审核员名单并清空角色缓存"""
+        self._reviewers = frozenset(self._get_reviewers_list())
+        self.invalidate_permission_cache()
+
+    def _resolve_user_role(self, user_phone: str) -> Optional[str]:
+        """查询数据库确定用户角色"""
+        # 📋 获取用户角色
+        user = db_manager.get_user(user_phone)
+        if not user:
+            return None  # 默认只读权限
+        
+        # 🎯 根据手机号确定角色
+        if user_phone == "admin":
+            role = "admin"
+        elif user_phone in self._reviewers:
+            role = "reviewer"
+        else:
+            role = "user"
+        
+        logger.debug(f"👤 获取用户角色: {user_phone} -> {role}")
+        return role
+
     def check_access(
         self, 
         user_phone: str, 
@@ -846,20 +1403,15 @@ class KnowledgeBaseMaintenance:
             (是否有权限, 详细消息)
         """
         try:
-            # 🔍 获取用户权限
-            user_permissions = self.get_user_permissions(user_phone)
-            
-            # 🔍 获取条目权限
-            entry_permissions = db_manager.get_knowledge_permissions(entry_id)
-            
             # 🎯 检查权限
-            has_permission = permission in user_permissions
+            has_permission = self._has_permission(user_phone, permission)
             
-            # 🔍 如果条目有特定权限设置，需要同时满足
+            # 🔍 角色具备该权限时才查询条目权限；如果条目有特定权限设置，需要同时满足
+            entry_permissions = self._get_entry_permissions(entry_id) if has_permission else None
             if entry_permissions:
-                has_permission = has_permission and (
+                has_permission = (
                     permission in entry_permissions or 
-                    any(role in self.role_permissions for role in entry_permissions)
+                    not self._role_perm_sets.keys().isdisjoint(entry_permissions)
                 )
             
             message = (
@@ -906,6 +1458,9 @@ class KnowledgeBaseMaintenance:
                 "permissions": valid_permissions,
                 "description": description
             }
+            self._role_perm_sets[role_name] = frozenset(valid_permissions)
+            self._role_checkers[role_name] = _make_permission_checker(valid_permissions)
+            self.invalidate_permission_cache()
             
             logger.info(f"➕ 创建新角色: {role_name}")
             return True, f"角色 {role_name} 创建成功"
@@ -979,25 +1534,25 @@ class KnowledgeBaseMaintenance:
             操作历史列表
         """
         try:
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            query = "SELECT * FROM audit_log WHERE 1=1"
-            params = []
-            
-            if user_phone:
-                query += " AND user_phone = ?"
-                params.append(user_phone)
-            
-            if operation_type:
-                query += " AND operation = ?"
-                params.append(operation_type)
-            
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
+            # 📝 先写入尚在队列中的日志，保证能查到刚发生的操作
+            self.flush_audit_log()
+            
+            # 🎯 每种筛选组合都对应一个以 timestamp 结尾的索引，按时间倒序扫描到 limit 条即停止
+            if user_phone and operation_type:
+                query = AUDIT_HISTORY_BY_USER_OP_SQL
+                params = (user_phone, operation_type, limit)
+            elif user_phone:
+                query = AUDIT_HISTORY_BY_USER_SQL
+                params = (user_phone, limit)
+            elif operation_type:
+                query = AUDIT_HISTORY_BY_OP_SQL
+                params = (operation_type, limit)
+            else:
+                query = AUDIT_HISTORY_SQL
+                params = (limit,)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            with self._acquire() as conn:
+                rows = conn.execute(query, params).fetchall()
             
             history = []
             for row in rows:
@@ -1008,11 +1563,10 @@ class KnowledgeBaseMaintenance:
                     "target_type": row[3],
                     "target_id": row[4],
                     "details": row[5],
-                    "timestamp": row[8],
-                    "success": bool(row[9])
+                    "timestamp": row[6],
+                    "success": bool(row[7])
                 })
             
-            conn.close()
             return history
             
         except Exception as e:
@@ -1032,68 +1586,101 @@ class KnowledgeBaseMaintenance:
         ip_address: str = None,
         user_agent: str = None
     ):
-        """记录操作日志"""
+        """记录操作日志 (入队后由后台线程批量写入)"""
+        self._audit_queue.put((
+            next(self._audit_ids), user_phone, operation, target_type, target_id, details,
+            ip_address, user_agent, _now_iso(), success
+        ))
+        if self._audit_queue.qsize() >= self._audit_batch_size:
+            self._audit_wakeup.set()
+
+    def _audit_flusher(self):
+        """后台线程：每200ms (或积压达到64条时立即) 把审计日志批量写入数据库，每天清理一次过期日志并压缩数据库"""
+        next_purge = time.monotonic()
+        while True:
+            self._audit_wakeup.wait(0.2)
+            self._audit_wakeup.clear()
+            self.flush_audit_log()
+            
+            if time.monotonic() >= next_purge:
+                self.purge_expired_audit_logs()
+                self.compact_database()
+                next_purge = time.monotonic() + 24 * 3600
+
+    def purge_expired_audit_logs(self) -> int:
+        """清理超过保留期的审计日志 (沿timestamp索引做范围删除)"""
+        cutoff = (datetime.now() - timedelta(days=self.audit_config["log_retention_days"])).isoformat()
         try:
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
+            with self._writer() as conn:
+                deleted = conn.execute(PURGE_AUDIT_SQL, (cutoff,)).rowcount
             
-            cursor.execute("""
-                INSERT INTO audit_log (
-                    user_phone, operation, target_type, target_id, details,
-                    ip_address, user_agent, timestamp, success
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                user_phone, operation, target_type, target_id, details,
-                ip_address, user_agent, datetime.now().isoformat(), success
-            ))
-            
-            conn.commit()
-            conn.close()
+            if deleted:
+                logger.info(f"🧹 清理过期审计日志: {deleted} 条 (早于 {cutoff})")
+            return deleted
             
         except Exception as e:
-            logger.error(f"❌ 记录操作日志失败: {str(e)}")
+            logger.error(f"❌ 清理过期审计日志失败: {str(e)}")
+            return 0
 
-    def _check_duplicate_content(self, file_path: Path) -> bool:
-        """检查内容是否重复"""
+    def compact_database(self):
+        """归还空闲页并截断WAL文件，防止数据库和WAL随删除操作持续膨胀"""
         try:
-            # 计算文件哈希
-            with open(file_path, 'rb') as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
+            with self._writer() as conn:
+                # executescript 会把语句执行到底；execute 只单步执行，每次仅释放一页
+                conn.executescript("PRAGMA incremental_vacuum(1000);")
+                busy, wal_pages, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
             
-            # 检查数据库中是否有相同哈希
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
+            logger.info(f"🧹 数据库压缩完成: WAL检查点 {wal_pages} 页{' (有读者占用，未完全截断)' if busy else ''}")
             
-            cursor.execute(
-                "SELECT COUNT(*) FROM knowledge_entries WHERE file_path LIKE ?",
-                (f"%{file_hash}%",)
-            )
-            
-            count = cursor.fetchone()[0]
-            conn.close()
+        except Exception as e:
+            logger.error(f"❌ 数据库压缩失败: {str(e)}")
+
+    def flush_audit_log(self):
+        """把队列中的审计日志在单个事务内批量写入 (每批最多500条)"""
+        with self._audit_flush_lock:
+            while True:
+                rows = []
+                while len(rows) < 500:
+                    try:
+                        rows.append(self._audit_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                
+                if not rows:
+                    return
+                
+                try:
+                    with self._writer() as conn:
+                        conn.executemany(INSERT_AUDIT_SQL, rows)
+                except Exception as e:
+                    logger.error(f"❌ 批量写入操作日志失败: {len(rows)} 条 - {str(e)}")
+
+    def _scan_file(self, file_path: Path) -> Tuple[str, int]:
+        """单次流式读取文件，同时得到内容哈希 (BLAKE2b-128) 和实际字节数"""
+        h = hashlib.blake2b(digest_size=16)
+        size = 0
+        for chunk in _iter_chunks(file_path):
+            h.update(chunk)
+            size += len(chunk)
+        return h.hexdigest(), size
+
+    def _check_duplicate_content(self, content_hash: str) -> Optional[int]:
+        """检查内容是否重复，返回已存在条目的ID"""
+        try:
+            with self._acquire() as conn:
+                row = conn.execute(SELECT_CONTENT_HASH_SQL, (content_hash,)).fetchone()
             
-            return count > 0
+            return row[0] if row else None
             
         except Exception:
-            return False
+            return None
 
     def _pre_assess_quality(self, file_path: Path, metadata: Dict[str, Any]) -> float:
         """预评估内容质量"""
         try:
             # 这里可以实现更复杂的质量评估算法
             # 基础版本：基于元数据完整性评分
-            score = 0.5  # 基础分
-            
-            if metadata.get("title"):
-                score += 0.2
-            if metadata.get("author"):
-                score += 0.1
-            if metadata.get("description"):
-                score += 0.1
-            if metadata.get("tags"):
-                score += 0.1
-            
-            return min(score, 1.0)
+            return _pre_assess_score(metadata)
             
         except Exception:
             return 0.5
@@ -1133,22 +1720,13 @@ class KnowledgeBaseMaintenance:
         except Exception as e:
             logger.error(f"❌ 自动批准失败: {entry_id} - {str(e)}")
 
-    def _submit_for_review(
-        self, 
-        entry_id: int, 
-        submitter_phone: str = None,
-        priority: int = 5,
-        notes: str = None,
-        is_update: bool = False
-    ) -> Tuple[bool, str]:
-        """内部方法：提交审核"""
-        # 实现已在上面提供
-        pass
-
     def _check_permission(self, permission: str, user_phone: str) -> bool:
         """检查用户权限"""
-        permissions = self.get_user_permissions(user_phone)
-        return permission in permissions
+        try:
+            return self._has_permission(user_phone, permission)
+        except Exception as e:
+            logger.error(f"❌ 获取用户权限失败: {str(e)}")
+            return permission == "read"
 
     def _check_update_permission(self, entry_id: int, user_phone: str) -> bool:
         """检查更新权限"""
@@ -1172,11 +1750,19 @@ class KnowledgeBaseMaintenance:
         return ["admin", "reviewer1", "reviewer2"]
 
     def _notify_reviewers(self, entry_id: int, priority: int):
-        """通知审核人员"""
+        """通知审核人员 (在后台线程中发送，不阻塞提交流程)"""
+        self._background_pool.submit(self._do_notify_reviewers, entry_id, priority)
+
+    def _do_notify_reviewers(self, entry_id: int, priority: int):
+        """发送审核通知"""
         logger.info(f"📧 通知审核人员: 条目 {entry_id}, 优先级: {priority}")
 
     def _notify_submitter(self, entry_id: int, status: str, comments: str):
-        """通知提交者"""
+        """通知提交者 (在后台线程中发送，不阻塞审核流程)"""
+        self._background_pool.submit(self._do_notify_submitter, entry_id, status, comments)
+
+    def _do_notify_submitter(self, entry_id: int, status: str, comments: str):
+        """发送审核结果通知"""
         logger.info(f"📧 通知提交者: 条目 {entry_id}, 状态: {status}")
 
     def _notify_low_quality_entries(self, entries: List[Dict[str, Any]]):
@@ -1184,64 +1770,75 @@ class KnowledgeBaseMaintenance:
         logger.warning(f"⚠️ 低质量条目通知: {len(entries)} 个条目需要关注")
 
     def _backup_before_delete(self, entry_id: int, entry: Dict[str, Any]) -> str:
-        """删除前备份"""
+        """删除前备份：追加一行到删除备份日志，并在索引表中记录其位置"""
         try:
-            backup_dir = config.BASE_DIR / "kb_backups" / "deletes"
-            backup_dir.mkdir(exist_ok=True)
-            
-            backup_file = backup_dir / f"deleted_{entry_id}_{int(time.time())}.json"
-            
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(entry, f, ensure_ascii=False, indent=2)
+            record = _dumps_json_line(entry)
+            
+            # 💾 只做一次追加写，不再为每次删除新建文件
+            with self._backup_lock:
+                if self._backup_fh.tell() + len(record) > self._backup_max_bytes:
+                    self._backup_fh.flush()
+                    os.fsync(self._backup_fh.fileno())
+                    self._backup_fh.close()
+                    self._open_backup_segment()
+                    logger.info(f"🔄 删除备份日志已滚动: {self._backup_path.name}")
+                
+                backup_path = self._backup_path
+                offset = self._backup_fh.tell()
+                self._backup_fh.write(record)
+                self._backup_fh.flush()
+            
+            with self._writer() as conn:
+                conn.execute(
+                    INSERT_DELETE_BACKUP_SQL,
+                    (entry_id, backup_path.name, offset, len(record), _now_iso())
+                )
             
-            return str(backup_file)
+            return str(backup_path)
             
         except Exception as e:
             logger.error(f"❌ 备份失败: {entry_id} - {str(e)}")
             return ""
 
     def _get_backup_info(self, entry_id: int) -> Optional[Dict[str, Any]]:
-        """获取备份信息"""
-        # 实现备份查找逻辑
-        return None
+        """获取备份信息：索引表定位最近一次删除备份，再从日志中按偏移读出该行"""
+        try:
+            with self._acquire() as conn:
+                row = conn.execute(SELECT_DELETE_BACKUP_SQL, (entry_id,)).fetchone()
+            if not row:
+                return None
+            
+            log_file, offset, length, deleted_at = row
+            backup_path = self._backup_dir / log_file
+            with open(backup_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(length)
+            
+            return {
+                "entry_id": entry_id,
+                "backup_path": str(backup_path),
+                "deleted_at": deleted_at,
+                "entry": json.loads(data)
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ 读取备份失败: {entry_id} - {str(e)}")
+            return None
 
     def _restore_from_backup(self, backup_info: Dict[str, Any]) -> bool:
-        """从备份恢复"""
+        """从备份恢复 (软删除的条目恢复为删除前的状态；硬删除的条目需重新上传文件)"""
         try:
-            # 实现恢复逻辑
-            return True
+            entry = backup_info["entry"]
+            if not db_manager.get_knowledge_entry(backup_info["entry_id"]):
+                logger.warning(f"⚠️ 条目已被硬删除，无法仅凭备份恢复: {backup_info['entry_id']}")
+                return False
+            
+            return db_manager.update_knowledge_status(backup_info["entry_id"], entry.get("status") or "pending")
             
         except Exception as e:
             logger.error(f"❌ 恢复失败: {str(e)}")
             return False
 
-    def _assess_completeness(self, entry: Dict[str, Any]) -> float:
-        """评估内容完整性"""
-        score = 0.0
-        
-        # 检查必填字段
-        required_fields = ["title", "author", "description"]
-        for field in required_fields:
-            if entry.get(field):
-                score += 0.33
-                
-        return min(score, 1.0)
-
-    def _assess_accuracy(self, entry: Dict[str, Any]) -> float:
-        """评估内容准确性"""
-        # 这里可以实现更复杂的准确性检查
-        return 0.8
-
-    def _assess_engagement(self, entry_id: int) -> float:
-        """评估用户互动"""
-        # 基于访问量和反馈评估
-        return 0.7
-
-    def _assess_technical_quality(self, entry: Dict[str, Any]) -> float:
-        """评估技术质量"""
-        # 基于文件类型和内容评估
-        return 0.9
-
     def _identify_quality_issues(self, entry: Dict[str, Any]) -> List[str]:
         """识别质量问题"""
         issues = []
@@ -1255,21 +1852,18 @@ class KnowledgeBaseMaintenance:
     def _update_review_queue(self, entry_id: int, reviewer_phone: str, status: str, comments: str):
         """更新审核队列"""
         try:
-            conn = db_manager.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE review_queue 
-                SET reviewer_phone = ?, status = ?, reviewed_at = ?, comments = ?
-                WHERE entry_id = ?
-            """, (reviewer_phone, status, datetime.now().isoformat(), comments, entry_id))
-            
-            conn.commit()
-            conn.close()
+            with self._writer() as conn:
+                self._update_review_queue_bulk(
+                    conn, [(reviewer_phone, status, _now_iso(), comments, entry_id)]
+                )
             
         except Exception as e:
             logger.error(f"❌ 更新审核队列失败: {str(e)}")
 
+    def _update_review_queue_bulk(self, conn, items: List[Tuple[str, str, str, str, int]]):
+        """在调用方的写事务内批量更新审核队列 (items: 审核人, 状态, 审核时间, 意见, 条目ID)"""
+        conn.executemany(UPDATE_REVIEW_SQL, items)
+
     def _handle_approved_entry(self, entry_id: int, quality_score: float):
         """处理批准的条目"""
         logger.info(f"✅ 处理批准的条目: {entry_id}, 评分: {quality_score}")
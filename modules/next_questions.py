@@ -49,24 +49,16 @@ class NextQuestionsPredictor:
         返回:
           格式化的历史上下文
         """
-        # 处理不同格式的历史记录
+        # 只处理最近的对话历史，无需遍历完整记录
         formatted_history = []
-        for item in history:
+        for item in history[-config.MAX_CHAT_HISTORY:]:
             if len(item) >= 2:
-                # 如果历史记录有2个元素 (角色, 内容)
-                role, content = item[0], item[1]
-                formatted_history.append((role, content))
-            elif len(item) == 3:
-                # 如果历史记录有3个元素 (角色, 内容, 时间戳)
-                role, content, _ = item
-                formatted_history.append((role, content))
+                # (角色, 内容) 或 (角色, 内容, 时间戳)
+                formatted_history.append((item[0], item[1]))
             else:
                 logger.warning(f"无效的历史记录格式: {item}")
 
-        # 只保留最近的对话历史
-        return (
-            formatted_history[-config.MAX_CHAT_HISTORY :] if formatted_history else []
-        )
+        return formatted_history
 
 
 # 全局问题预测器实例
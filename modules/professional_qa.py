@@ -3,6 +3,36 @@ from modules.web_search import web_searcher
 from utils.logger import logger
 
 
+# 📝 提示模板的静态部分 (模块加载时构建一次，调用时只拼接问题文本)
+_COMPARE_PREFIX = """你是一个专业顾问，请比较以下选项并提供选择建议：
+
+问题："""
+
+_COMPARE_SUFFIX = """
+
+请分析各选项的优缺点，考虑以下因素：
+1. 成本效益
+2. 适用场景
+3. 长期影响
+4. 用户特定需求
+
+最后给出推荐选择："""
+
+_EVALUATE_PREFIX = """你是一个专业评估师，请对以下内容进行评估并提供建议：
+
+问题："""
+
+_EVALUATE_SUFFIX = """
+
+请从以下角度进行全面评估：
+1. 当前状态分析
+2. 潜在风险
+3. 改进机会
+4. 最佳实践参考
+
+最后给出具体、可操作的建议："""
+
+
 class ProfessionalQA:
     """
     专业领域问答模块
@@ -53,19 +83,7 @@ class ProfessionalQA:
 
         try:
             # 构造专业提示
-            prompt = f"""
-            你是一个专业顾问，请比较以下选项并提供选择建议：
-            
-            问题：{question}
-            
-            请分析各选项的优缺点，考虑以下因素：
-            1. 成本效益
-            2. 适用场景
-            3. 长期影响
-            4. 用户特定需求
-            
-            最后给出推荐选择：
-            """
+            prompt = _COMPARE_PREFIX + question + _COMPARE_SUFFIX
 
             return llm_utils.generate_text(prompt)
         except Exception as e:
@@ -83,19 +101,7 @@ class ProfessionalQA:
         logger.info(f"处理评估与建议类问题: {question}")
 
         # 构造专业提示
-        prompt = f"""
-        你是一个专业评估师，请对以下内容进行评估并提供建议：
-        
-        问题：{question}
-        
-        请从以下角度进行全面评估：
-        1. 当前状态分析
-        2. 潜在风险
-        3. 改进机会
-        4. 最佳实践参考
-        
-        最后给出具体、可操作的建议：
-        """
+        prompt = _EVALUATE_PREFIX + question + _EVALUATE_SUFFIX
 
         return llm_utils.generate_text(prompt)
 
@@ -1,11 +1,33 @@
 import uuid
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from utils.llm_utils import llm_utils
 from config import config
 from utils.logger import logger
 
 
+# 📝 回答提示模板的静态部分 (模块加载时构建一次，调用时只拼接资料和问题)
+_ANSWER_PREFIX = """🤖 你是一个智能课程助手，请根据提供的课程资料回答问题。
+如果上下文信息不足以回答问题，请如实告知。
+
+📚 相关资料：
+"""
+
+_ANSWER_MIDDLE = """
+
+❓ 问题：
+"""
+
+_ANSWER_SUFFIX = """
+
+💡 请根据以上信息提供准确、简洁的回答："""
+
+
 class RAGSystem:
     """
     🧠 检索增强生成(RAG)系统
@@ -28,8 +50,101 @@ class RAGSystem:
             path=str(config.VECTOR_STORE_DIR), 
             settings=Settings(allow_reset=True)
         )
+        
+        # 🗂️ 会话集合缓存 (LRU)：会话UUID -> Collection，避免每次检索都向客户端查找集合
+        self._collections = OrderedDict()
+        self._collections_lock = threading.Lock()
+        self._max_cached_collections = 256
+        
+        # 📦 查询向量微批处理：10ms窗口内的并发检索合并为一次嵌入计算
+        # (会话集合创建时未指定嵌入函数，使用的即是Chroma默认嵌入函数)
+        self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self._pending_embeds = []
+        self._embed_cond = threading.Condition()
+        self._embed_window = 0.01
+        threading.Thread(target=self._embed_batcher, name="rag-embed-batcher", daemon=True).start()
+        
+        # 🔥 后台预热已有会话集合的句柄，首次检索无需再打开集合
+        threading.Thread(target=self._warm_collections, name="rag-collection-warmer", daemon=True).start()
         logger.info("✅ RAG系统初始化完成")
 
+    def _warm_collections(self):
+        """后台线程：把已有的会话集合句柄预先载入缓存 (最多填满缓存容量)"""
+        try:
+            warmed = 0
+            for item in self.chroma_client.list_collections():
+                # 新版Chroma返回集合名称，旧版返回Collection对象
+                name = getattr(item, "name", item)
+                if not name.startswith("session_"):
+                    continue
+                
+                sid_str = name[len("session_"):]
+                collection = self.chroma_client.get_collection(name)
+                with self._collections_lock:
+                    if len(self._collections) >= self._max_cached_collections:
+                        break
+                    # 检索线程已载入的句柄优先保留
+                    self._collections.setdefault(sid_str, collection)
+                warmed += 1
+            
+            logger.info(f"🔥 会话向量集合预热完成: {warmed} 个")
+        except Exception as e:
+            logger.warning(f"⚠️ 会话向量集合预热失败: {str(e)}")
+
+    def _embed_batcher(self):
+        """后台线程：收集一个时间窗口内的查询文本，一次性计算嵌入后分发给各调用方"""
+        while True:
+            with self._embed_cond:
+                while not self._pending_embeds:
+                    self._embed_cond.wait()
+            
+            # ⏳ 等待窗口结束，让同时到达的请求进入同一批
+            time.sleep(self._embed_window)
+            with self._embed_cond:
+                batch, self._pending_embeds = self._pending_embeds, []
+            
+            try:
+                embeddings = self._embedding_function([text for text, _ in batch])
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+                if len(batch) > 1:
+                    logger.debug(f"📦 合并计算查询向量: {len(batch)} 条")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def _embed_query(self, query: str):
+        """提交查询文本到微批队列并等待其嵌入向量"""
+        future = Future()
+        with self._embed_cond:
+            self._pending_embeds.append((query, future))
+            self._embed_cond.notify()
+        return future.result()
+
+    def _get_session_collection(self, sid_str: str):
+        """获取 (不存在时创建) 会话专属向量集合，结果按LRU缓存"""
+        with self._collections_lock:
+            collection = self._collections.get(sid_str)
+            if collection is not None:
+                self._collections.move_to_end(sid_str)
+                return collection
+        
+        collection = self.chroma_client.get_or_create_collection(
+            name=f"session_{sid_str}",
+            metadata={"hnsw:space": "cosine"}
+        )
+        
+        with self._collections_lock:
+            self._collections[sid_str] = collection
+            if len(self._collections) > self._max_cached_collections:
+                self._collections.popitem(last=False)
+        return collection
+
+    def evict_collection(self, sid: str):
+        """会话结束或集合被删除后移除缓存的集合句柄"""
+        with self._collections_lock:
+            self._collections.pop(str(sid), None)
+
     def retrieve(self, query: str, sid: str, top_k: int = 5) -> list:
         """
         🔍 从向量数据库中检索相关信息
@@ -51,34 +166,20 @@ class RAGSystem:
                 logger.error(f"❌ 无效的会话UUID格式: {sid}")
                 return []
             
-            # 📝 使用UUID格式的会话ID创建集合名称
-            collection_name = f"session_{sid_str}"
-            logger.debug(f"🗄️ 使用向量集合: {collection_name}")
-
-            # 🔍 检查集合是否存在
-            try:
-                collection = self.chroma_client.get_collection(collection_name)
-                logger.info(f"✅ 找到向量集合: {collection_name}")
-            except Exception:
-                logger.warning(f"⚠️ 向量集合不存在: {collection_name}")
-                # 🆕 创建新的会话专属集合
-                self.chroma_client.get_or_create_collection(
-                    name=collection_name,
-                    metadata={"hnsw:space": "cosine"}
-                )
-                logger.info(f"✅ 创建新会话向量集合: {collection_name}")
-                return []
+            # 🗄️ 获取会话专属集合 (不存在时直接创建，空集合的查询结果为空)
+            collection = self._get_session_collection(sid_str)
+            logger.debug(f"🗄️ 使用向量集合: session_{sid_str}")
 
-            # 🔍 执行查询（会话隔离）
+            # 🔍 执行查询（会话隔离，只取用到的文档文本）
             results = collection.query(
-                query_texts=[query], 
+                query_embeddings=[self._embed_query(query)], 
                 n_results=top_k,
-                include=["documents", "metadatas", "distances"]
+                include=["documents"]
             )
 
-            # 📋 确保返回的是字符串列表
-            if results and results.get("documents"):
-                docs = [str(doc) for doc in results["documents"][0]]
+            # 📋 Chroma 返回的文档本身就是字符串列表，直接使用
+            docs = results["documents"][0] if results and results.get("documents") else None
+            if docs:
                 logger.info(f"✅ 检索完成: 会话UUID={sid_str}, 找到 {len(docs)} 条相关文档")
                 return docs
             
@@ -104,18 +205,8 @@ class RAGSystem:
             context_str = "\n\n".join(context) if context else "📭 无相关上下文信息"
             
             # 🎯 构造提示
-            prompt = f"""
-            🤖 你是一个智能课程助手，请根据提供的课程资料回答问题。
-            如果上下文信息不足以回答问题，请如实告知。
-            
-            ❓ 问题：
-            {query}
-            
-            📚 相关资料：
-            {context_str}
-            
-            💡 请根据以上信息提供准确、简洁的回答：
-            """
+            # 资料在前、问题在后，相同资料可命中服务端的提示前缀缓存
+            prompt = "".join((_ANSWER_PREFIX, context_str, _ANSWER_MIDDLE, query, _ANSWER_SUFFIX))
             
             # 🤖 使用LLM生成回答
             logger.info("🤖 开始生成回答...")
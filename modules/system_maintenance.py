@@ -1,20 +1,233 @@
 import os
 import sys
+import json
+import hashlib
 import time
+import queue
+import atexit
 import shutil
+import tarfile
+import zipfile
 import psutil
 import logging
 import subprocess
 import smtplib
 import threading
+import functools
+import multiprocessing
 from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
 from config import config
 from utils.logger import logger
 from utils.database import db_manager
 
+try:
+    import zstandard
+except ImportError:  # 未安装时回退到zip归档
+    zstandard = None
+
+try:
+    import blake3
+except ImportError:  # 未安装时回退到标准库 blake2b
+    blake3 = None
+
+
+# 💾 备份归档后缀 (优先 tar+zstd 多线程流式压缩)
+_BACKUP_SUFFIXES = (".tar.zst", ".zip")
+
+
+def _archive_sources(sources: List[Path], backup_base: Path) -> Path:
+    """
+    💾 把备份源打包为单个归档文件，各源以自身名称作为归档内的顶层条目
+    
+    参数:
+      sources: 需要备份的目录或文件
+      backup_base: 不含后缀的归档路径
+    返回:
+      生成的归档文件路径
+    """
+    if zstandard:
+        archive_path = backup_base.parent / f"{backup_base.name}.tar.zst"
+        cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+        with open(archive_path, "wb") as f, cctx.stream_writer(f) as comp, \
+                tarfile.open(fileobj=comp, mode="w|") as tar:
+            for src in sources:
+                if src.exists():
+                    tar.add(src, arcname=src.name)
+        return archive_path
+    
+    archive_path = backup_base.parent / f"{backup_base.name}.zip"
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for src in sources:
+            if src.is_dir():
+                for file in src.rglob("*"):
+                    zf.write(file, file.relative_to(src.parent))
+            elif src.exists():
+                zf.write(src, src.name)
+    return archive_path
+
+
+def _snapshot_sources(sources: List[Path], snapshot_dir: Path, prev_dir: Optional[Path]) -> Tuple[int, int]:
+    """
+    🔗 增量快照：未变化的文件从上一份快照硬链接，变化的文件才复制
+    
+    参数:
+      sources: 需要备份的目录或文件
+      snapshot_dir: 新快照目录 (各源以自身名称作为顶层条目)
+      prev_dir: 上一份快照目录 (没有时全部复制)
+    返回:
+      (快照总字节数, 本次实际复制的字节数)
+    """
+    prev_manifest = {}
+    if prev_dir is not None:
+        with open(prev_dir / "manifest.json", "r", encoding="utf-8") as f:
+            prev_manifest = json.load(f)
+    
+    manifest = {}
+    total_size = copied_size = 0
+    for src in sources:
+        if src.is_dir():
+            files = [p for p in src.rglob("*") if p.is_file()]
+        elif src.exists():
+            files = [src]
+        else:
+            continue
+        
+        for file in files:
+            rel = file.relative_to(src.parent).as_posix()
+            st = file.stat()
+            signature = [st.st_size, st.st_mtime_ns]
+            manifest[rel] = signature
+            total_size += st.st_size
+            
+            target = snapshot_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if prev_manifest.get(rel) == signature:
+                try:
+                    os.link(prev_dir / rel, target)
+                    continue
+                except OSError:
+                    pass  # 不支持硬链接 (如跨文件系统) 时退回复制
+            shutil.copy2(file, target)
+            copied_size += st.st_size
+    
+    with open(snapshot_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return total_size, copied_size
+
+
+def _clone_file(src, dst):
+    """
+    📄 复制单个文件：优先 os.copy_file_range (在 btrfs/XFS 等文件系统上由内核直接做写时复制克隆)，
+    不支持时回退到 shutil.copy2
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+def _fast_copytree(src: Path, dst: Path):
+    """📂 复制目录树，逐个文件使用 _clone_file"""
+    shutil.copytree(src, dst, copy_function=_clone_file)
+
+
+# 🐧 Linux 下直接解析 /proc，只读取用到的字段
+_USE_PROC = sys.platform.startswith("linux") and os.path.exists("/proc/meminfo")
+
+
+def _mem_percent() -> float:
+    """🧠 内存使用率：Linux 下只解析 /proc/meminfo 的 MemTotal/MemAvailable (口径与 psutil 一致)"""
+    if _USE_PROC:
+        with open("/proc/meminfo", "rb") as f:
+            fields = f.read(512).split()
+        try:
+            total = int(fields[fields.index(b"MemTotal:") + 1])
+            available = int(fields[fields.index(b"MemAvailable:") + 1])
+            return round((total - available) / total * 100, 1)
+        except ValueError:
+            pass  # 旧内核没有 MemAvailable，交给 psutil 估算
+    return psutil.virtual_memory().percent
+
+
+def _read_cpu_times() -> Tuple[int, int]:
+    """💻 读取 /proc/stat 汇总行，返回 (空闲时间, 总时间)，单位为时钟滴答"""
+    with open("/proc/stat", "rb") as f:
+        # cpu user nice system idle iowait irq softirq steal ...
+        values = [int(v) for v in f.readline().split()[1:9]]
+    return values[3] + values[4], sum(values)
+
+
+def _disk_percent(path: str = "/") -> float:
+    """💾 磁盘使用率：直接调用 statvfs (口径与 psutil.disk_usage 一致)，无 statvfs 的平台回退到 psutil"""
+    if not hasattr(os, "statvfs"):
+        return psutil.disk_usage(path).percent
+    st = os.statvfs(path)
+    used = st.f_blocks - st.f_bfree
+    total_usable = used + st.f_bavail
+    return round(used / total_usable * 100, 1) if total_usable else 0.0
+
+
+def _is_backup_entry(entry: os.DirEntry) -> bool:
+    """🔍 判断目录项是否为备份 (backup_ 前缀的归档文件或快照目录)"""
+    return entry.name.startswith("backup_") and (entry.name.endswith(_BACKUP_SUFFIXES) or entry.is_dir())
+
+
+def _file_checksum(path: Path, algorithm: Optional[str] = None) -> str:
+    """
+    🔐 计算备份文件校验和，返回 "算法:十六进制摘要"
+    默认优先使用 BLAKE3 (SIMD + 多线程)，未安装时使用 blake2b；校验时按记录中的算法重新计算
+    """
+    algorithm = algorithm or ("blake3" if blake3 else "blake2b")
+    if algorithm == "blake3":
+        if blake3 is None:
+            raise RuntimeError("校验该备份需要安装 blake3")
+        digest = blake3.blake3(max_threads=blake3.blake3.AUTO).update_mmap(path).hexdigest()
+    else:
+        hasher = hashlib.blake2b()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+    return f"{algorithm}:{digest}"
+
+
+def _extract_archive(archive_path: Path, dest_dir: Path):
+    """📦 解压备份归档 (按后缀识别 tar+zstd 或 zip)"""
+    if archive_path.name.endswith(".tar.zst"):
+        if zstandard is None:
+            raise RuntimeError("恢复 .tar.zst 备份需要安装 zstandard")
+        dctx = zstandard.ZstdDecompressor()
+        with open(archive_path, "rb") as f, dctx.stream_reader(f) as reader, \
+                tarfile.open(fileobj=reader, mode="r|") as tar:
+            if hasattr(tarfile, "data_filter"):
+                # 🛡️ data 过滤器拒绝绝对路径、越出目标目录的路径和指向目录外的链接
+                tar.extractall(dest_dir, filter="data")
+            else:
+                # 🛡️ 旧版本Python不支持 filter 参数：逐个校验成员路径后再解压
+                root = dest_dir.resolve()
+                for member in tar:
+                    target = (dest_dir / member.name).resolve()
+                    if member.issym() or member.islnk() or not target.is_relative_to(root):
+                        raise RuntimeError(f"备份归档包含不安全的成员: {member.name}")
+                    tar.extract(member, dest_dir)
+    else:
+        shutil.unpack_archive(archive_path, dest_dir, "zip")
+
+
 class SystemMaintenance:
     """
     🔧 系统维护模块
@@ -39,6 +252,11 @@ class SystemMaintenance:
         # 📄 版本历史文件
         self.version_history_file = self.backup_dir / "version_history.txt"
         
+        # 📝 系统状态日志目录 (启动时创建一次)
+        self._system_log_dir = config.LOG_DIR / "system_status"
+        self._system_log_dir.mkdir(exist_ok=True, parents=True)
+        self._version_cache: Optional[List[str]] = None  # 版本历史内存缓存 (首次读取时加载)
+        
         # ⏱️ 监控间隔 (秒)
         self.monitor_interval = 300  # 5分钟
         
@@ -48,21 +266,67 @@ class SystemMaintenance:
         # 📝 系统状态日志间隔 (秒)
         self.status_log_interval = 60  # 1分钟
         
-        # 🕐 最后一次备份时间
-        self.last_backup_time = time.time()
-        
-        # 🕐 最后一次监控时间
-        self.last_monitor_time = time.time()
+        # 🔒 任务互斥锁：非阻塞获取，已有同类任务在执行时直接跳过
+        self._backup_lock = threading.Lock()
+        self._monitor_lock = threading.Lock()
         
-        # 🕐 最后一次状态日志时间
-        self.last_status_log_time = time.time()
+        # ⏰ 健康检查和定期备份的下次到期时间 (由 _tick 判断)
+        self._next_monitor_at = time.monotonic() + self.monitor_interval
+        self._next_backup_at = time.monotonic() + self.backup_interval
+        self._backup_pool: Optional[ProcessPoolExecutor] = None  # 定期备份进程池 (首次备份时创建)
         
         # 📧 告警收件人
         self.admin_email = "admin@example.com"
         
+        # 📮 SMTP服务器 (实际环境中配置，例如 'smtp.example.com'；为 None 时只记录不发信)
+        self.smtp_server = None
+        
+        # 📬 告警队列：邮件发送和入库由后台线程完成，监控线程不等待SMTP握手
+        self._alert_queue = queue.Queue()
+        
+        # 🗃️ 告警入库缓冲：攒够16条或最早一条等待满5秒时，一个事务批量写入
+        self._alert_buffer: List[Tuple[str, str, str]] = []
+        self._alert_buffer_lock = threading.Lock()
+        self._alert_batch_size = 16
+        self._alert_flush_seconds = 5
+        atexit.register(self._flush_alert_buffer)
+        threading.Thread(target=self._alert_worker, name="sys-alert-sender", daemon=True).start()
+        
+        # 📊 资源指标缓存：TTL内的所有调用方共用同一次采样结果
+        self._metrics_cache = {
+            "ts": 0.0, "cpu": 0.0, "mem": 0.0, "disk": 0.0,
+            "rss_mb": 0.0, "threads": 0,
+            "display": {"cpu": "N/A", "mem": "N/A", "disk": "N/A"}
+        }
+        self._metrics_lock = threading.Lock()
+        self._metrics_ttl = 5  # 秒
+        
+        # 📝 系统状态日志缓冲：攒够一批 (或跨天) 再一次性追加到日志文件
+        self._status_buffer: List[str] = []
+        self._status_buffer_date = None
+        self._status_flush_lines = 10
+        self._status_lock = threading.Lock()
+        self._status_fh = None       # 当天日志文件句柄，保持打开，跨天时重新打开
+        self._status_fh_date = None
+        atexit.register(self._flush_status_buffer)
+        
+        # 💻 预热CPU采样：之后读取与上次采样之间的差值，不再阻塞1秒
+        self._last_cpu_times = None
+        self._cpu_percent()
+        
+        # 🧩 当前进程句柄只创建一次，进程级指标通过 oneshot 一次性读取
+        self._proc = psutil.Process()
+        
         # 📝 初始化版本历史
         self._init_version_history()
         
+        # 🗂️ 版本 -> 最新备份路径 的内存索引 (启动时从备份记录构建，每次备份后更新)
+        self._version_to_backup: Dict[str, Path] = {}
+        self._init_backup_index()
+        
+        # 🏷️ 旧版本的状态日志文件名带表情前缀，迁移为纯ASCII文件名
+        self._migrate_status_log_names()
+        
         # 🚀 启动系统监控线程
         self._start_monitor_thread()
         
@@ -75,23 +339,46 @@ class SystemMaintenance:
                 f.write(f"1.0.0 - {datetime.now().isoformat()} - 🚀 初始版本\n")
             logger.info("📝 版本历史文件已创建")
 
+    def _init_backup_index(self):
+        """🗂️ 从数据库备份记录构建版本索引 (记录按时间倒序，每个版本保留最新的一份)"""
+        try:
+            for record in db_manager.get_backup_records():
+                path = Path(record["backup_path"])
+                if record["version"] and path.exists():
+                    self._version_to_backup.setdefault(record["version"], path)
+        except Exception as e:
+            logger.error(f"❌ 备份索引构建失败: {str(e)}")
+
+    def _migrate_status_log_names(self):
+        """🏷️ 把 "📊 system_status_<日期>.log" 重命名为 "system_status_<日期>.log" (目标已存在时合并内容)"""
+        try:
+            for old_file in self._system_log_dir.glob("📊 system_status_*.log"):
+                new_file = old_file.with_name(old_file.name.replace("📊 ", "", 1))
+                if new_file.exists():
+                    with open(old_file, "rb") as src, open(new_file, "ab") as dst:
+                        shutil.copyfileobj(src, dst)
+                    old_file.unlink()
+                else:
+                    old_file.rename(new_file)
+                logger.info(f"🏷️ 状态日志已重命名: {new_file.name}")
+        except Exception as e:
+            logger.error(f"❌ 状态日志重命名失败: {str(e)}")
+
     def _start_monitor_thread(self):
         """🚀 启动后台监控线程"""
         def monitor_loop():
             logger.info("🚀 系统监控线程已启动")
+            
+            # ⏰ 按状态日志间隔对齐唤醒，每次唤醒只执行一次合并后的 _tick
+            next_tick = time.monotonic() + self.status_log_interval
             while True:
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_tick += self.status_log_interval
+                
                 try:
-                    # 📊 执行系统监控
-                    self.monitor_system_health()
-                    
-                    # 📝 记录系统状态
-                    self.log_system_status()
-                    
-                    # 💾 执行定期备份
-                    self.periodic_backup()
-                    
-                    # ⏱️ 每分钟执行一次
-                    time.sleep(60)
+                    self._tick()
                 except Exception as e:
                     logger.error(f"💥 系统监控线程异常: {str(e)}")
         
@@ -100,35 +387,89 @@ class SystemMaintenance:
         thread.start()
         logger.info("✅ 系统监控线程已启动")
     
+    def _tick(self):
+        """
+        ⏱️ 监控线程的一次合并执行：只采样一次，依次写状态日志、按需做健康检查、按需提交备份
+        """
+        now = time.monotonic()
+        sample = self._sample_metrics()
+        
+        self.log_system_status(sample)
+        
+        if now >= self._next_monitor_at:
+            self._next_monitor_at = now + self.monitor_interval
+            self.monitor_system_health(sample)
+        
+        if now >= self._next_backup_at:
+            self._next_backup_at = now + self.backup_interval
+            # 💾 备份在独立进程中执行，这里只负责提交，不拖慢下一次采样
+            self.periodic_backup()
+    
     # ================================ 📊 系统健康监控功能 ================================
     
-    def monitor_system_health(self):
+    def _cpu_percent(self) -> float:
+        """💻 自上次采样以来的CPU使用率 (Linux 下按 /proc/stat 差值计算，其他平台使用 psutil)"""
+        if not _USE_PROC:
+            return psutil.cpu_percent(interval=None)
+        
+        idle, total = _read_cpu_times()
+        last, self._last_cpu_times = self._last_cpu_times, (idle, total)
+        if last is None or total <= last[1]:
+            return 0.0
+        busy = (total - last[1]) - (idle - last[0])
+        return round(busy / (total - last[1]) * 100, 1)
+    
+    def _sample_metrics(self) -> Tuple[float, float, float]:
+        """
+        📊 采样CPU、内存、磁盘使用率 (TTL内直接返回缓存结果)
+        返回:
+          (cpu_percent, mem_percent, disk_percent)
+        """
+        with self._metrics_lock:
+            cache = self._metrics_cache
+            if time.monotonic() - cache["ts"] >= self._metrics_ttl:
+                cache["cpu"] = self._cpu_percent()
+                cache["mem"] = _mem_percent()
+                cache["disk"] = _disk_percent('/')
+                with self._proc.oneshot():
+                    cache["rss_mb"] = round(self._proc.memory_info().rss / 1048576, 1)
+                    cache["threads"] = self._proc.num_threads()
+                # 供管理后台展示的格式化结果 (整体替换，读取方无需加锁)
+                cache["display"] = {
+                    "cpu": f"{cache['cpu']}%",
+                    "mem": f"{cache['mem']}%",
+                    "disk": f"{cache['disk']}%"
+                }
+                cache["ts"] = time.monotonic()
+            return cache["cpu"], cache["mem"], cache["disk"]
+    
+    def monitor_system_health(self, sample: Optional[Tuple[float, float, float]] = None):
         """
         📊 监控系统健康状况
         功能点：
           - 📊 资源监控：CPU、内存、磁盘
           - 📝 错误日志记录
           - 📧 告警系统
+        
+        参数:
+          sample: 已采集的 (CPU, 内存, 磁盘) 使用率，为空时自行采样
         """
+        # 🔒 上一轮检查尚未结束时直接跳过，避免重复采样和重复告警
+        if not self._monitor_lock.acquire(blocking=False):
+            return
+        
         try:
-            current_time = time.time()
-            # 🕐 检查是否达到监控间隔
-            if current_time - self.last_monitor_time < self.monitor_interval:
-                return
-            
-            self.last_monitor_time = current_time
-            
             # 📊 收集系统指标
-            cpu_percent = psutil.cpu_percent(interval=1)
-            mem_percent = psutil.virtual_memory().percent
-            disk_percent = psutil.disk_usage('/').percent
+            cpu_percent, mem_percent, disk_percent = sample or self._sample_metrics()
             
             # 📝 记录系统指标
             logger.info(
                 f"📊 系统监控 - "
                 f"💻 CPU: {cpu_percent}%, "
                 f"🧠 内存: {mem_percent}%, "
-                f"💾 磁盘: {disk_percent}%"
+                f"💾 磁盘: {disk_percent}%, "
+                f"🧩 进程内存: {self._metrics_cache['rss_mb']}MB, "
+                f"🧵 线程数: {self._metrics_cache['threads']}"
             )
             
             # ⚠️ 检查资源使用情况
@@ -152,43 +493,59 @@ class SystemMaintenance:
                 self.send_alert(alert_message)
         except Exception as e:
             logger.error(f"💥 系统监控异常: {str(e)}")
+        finally:
+            self._monitor_lock.release()
     
-    def log_system_status(self):
+    def log_system_status(self, sample: Optional[Tuple[float, float, float]] = None):
         """
         📝 记录系统状态到专用日志文件
         每分钟记录一次CPU、内存和磁盘使用率
-        """
-        current_time = time.time()
-        # 🕐 检查是否达到日志间隔
-        if current_time - self.last_status_log_time < self.status_log_interval:
-            return
-        
-        self.last_status_log_time = current_time
         
+        参数:
+          sample: 已采集的 (CPU, 内存, 磁盘) 使用率，为空时自行采样
+        """
         # 📊 收集系统指标
-        cpu_percent = psutil.cpu_percent(interval=1)
-        mem_percent = psutil.virtual_memory().percent
-        disk_percent = psutil.disk_usage('/').percent
-        
-        # 📝 创建系统状态日志目录
-        system_log_dir = config.LOG_DIR / "system_status"
-        system_log_dir.mkdir(exist_ok=True, parents=True)
-        
-        # 📅 按日期创建日志文件
-        log_date = datetime.now().strftime("%Y-%m-%d")
-        log_file = system_log_dir / f"📊 system_status_{log_date}.log"
+        cpu_percent, mem_percent, disk_percent = sample or self._sample_metrics()
         
-        # 📝 构建日志条目
+        # 📝 构建日志条目 (只取一次当前时间、格式化一次，日期直接取时间戳前缀)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_date = timestamp[:10]
         log_entry = f"{timestamp} - 💻 CPU: {cpu_percent}%, 🧠 内存: {mem_percent}%, 💾 磁盘: {disk_percent}%\n"
         
-        # 📝 写入日志文件
+        # 📝 写入缓冲区，跨天时先把前一天的条目写入前一天的文件
+        with self._status_lock:
+            if self._status_buffer and log_date != self._status_buffer_date:
+                self._write_status_buffer()
+            self._status_buffer.append(log_entry)
+            self._status_buffer_date = log_date
+            if len(self._status_buffer) >= self._status_flush_lines:
+                self._write_status_buffer()
+    
+    def _flush_status_buffer(self):
+        """📝 立即写出缓冲区中的系统状态日志 (进程退出时调用)"""
+        with self._status_lock:
+            self._write_status_buffer()
+    
+    def _write_status_buffer(self):
+        """📝 把缓冲区条目一次性追加到对应日期的日志文件 (调用方持有 _status_lock)"""
+        if not self._status_buffer:
+            return
+        
         try:
-            with open(log_file, "a") as f:
-                f.write(log_entry)
-            logger.debug("📝 系统状态日志已写入")
+            if self._status_fh is None or self._status_fh_date != self._status_buffer_date:
+                if self._status_fh is not None:
+                    self._status_fh.close()
+                log_file = self._system_log_dir / f"system_status_{self._status_buffer_date}.log"
+                self._status_fh = open(log_file, "a", encoding="utf-8")
+                self._status_fh_date = self._status_buffer_date
+            
+            self._status_fh.write("".join(self._status_buffer))
+            self._status_fh.flush()
+            logger.debug(f"📝 系统状态日志已写入: {len(self._status_buffer)} 条")
         except Exception as e:
             logger.error(f"❌ 系统状态日志写入失败: {str(e)}")
+        finally:
+            self._status_buffer.clear()
     
     def _check_error_logs(self) -> List[str]:
         """🔍 检查最近的错误日志"""
@@ -196,32 +553,77 @@ class SystemMaintenance:
         # 📋 返回最近5分钟内的错误日志
         return []
     
-    def send_alert(self, message: str):
+    def send_alert(self, message: str, level: str = "warning"):
         """
-        📧 发送系统告警
+        📧 发送系统告警 (放入告警队列后立即返回)
         
         参数:
           message: 告警消息
+          level: 告警级别
         """
-        try:
-            # 📝 创建邮件内容
-            msg = MIMEText(f"🚨 系统告警:\n\n{message}")
-            msg['Subject'] = '🚨 系统健康告警'
-            msg['From'] = '🤖 system@example.com'
-            msg['To'] = self.admin_email
+        self._alert_queue.put_nowait((message, level, datetime.now().isoformat()))
+    
+    def _alert_worker(self):
+        """📬 后台线程：逐条发送告警邮件 (复用同一个SMTP连接)，入库则攒批写入"""
+        server = None
+        first_buffered = None
+        while True:
+            # ⏳ 缓冲区非空时最多等到刷写时限，到期后先刷写再继续等待
+            timeout = None
+            if first_buffered is not None:
+                timeout = max(0.0, first_buffered + self._alert_flush_seconds - time.monotonic())
+            try:
+                message, level, created_at = self._alert_queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_alert_buffer()
+                first_buffered = None
+                continue
             
-            # 📧 发送邮件 (实际环境中需要配置SMTP服务器)
-            # with smtplib.SMTP('smtp.example.com') as server:
-            #     server.send_message(msg)
+            try:
+                # 📝 创建邮件内容
+                msg = MIMEText(f"🚨 系统告警:\n\n{message}")
+                msg['Subject'] = '🚨 系统健康告警'
+                msg['From'] = '🤖 system@example.com'
+                msg['To'] = self.admin_email
+                
+                # 📧 发送邮件，连接被服务器断开时重连一次
+                if self.smtp_server:
+                    for attempt in range(2):
+                        try:
+                            if server is None:
+                                server = smtplib.SMTP(self.smtp_server)
+                            server.send_message(msg)
+                            break
+                        except smtplib.SMTPServerDisconnected:
+                            server = None
+                            if attempt:
+                                raise
+                
+                logger.warning(f"📧 告警已发送给 {self.admin_email}: {message}")
+            except Exception as e:
+                server = None
+                logger.error(f"❌ 发送告警失败: {str(e)}")
             
-            logger.warning(f"📧 告警已发送给 {self.admin_email}: {message}")
-        except Exception as e:
-            logger.error(f"❌ 发送告警失败: {str(e)}")
+            # 📝 放入入库缓冲区，满批时立即写入
+            with self._alert_buffer_lock:
+                self._alert_buffer.append((message, level, created_at))
+                full = len(self._alert_buffer) >= self._alert_batch_size
+            if first_buffered is None:
+                first_buffered = time.monotonic()
+            if full:
+                self._flush_alert_buffer()
+                first_buffered = None
+    
+    def _flush_alert_buffer(self):
+        """🗃️ 把缓冲的告警在一个事务内写入数据库 (进程退出时也会调用)"""
+        with self._alert_buffer_lock:
+            alerts, self._alert_buffer = self._alert_buffer, []
+        if not alerts:
+            return
         
-        # 📝 记录到数据库
         try:
-            db_manager.add_system_alert(message, "warning")
-            logger.info("📝 告警已记录到数据库")
+            db_manager.add_system_alerts_bulk(alerts)
+            logger.info(f"📝 告警已记录到数据库: {len(alerts)} 条")
         except Exception as e:
             logger.error(f"❌ 写入告警到数据库失败: {str(e)}")
 
@@ -232,16 +634,9 @@ class SystemMaintenance:
             系统指标字典 {"cpu": ..., "mem": ..., "disk": ...}
         """
         try:
-            # 📊 收集系统指标
-            cpu_percent = psutil.cpu_percent(interval=1)
-            mem_percent = psutil.virtual_memory().percent
-            disk_percent = psutil.disk_usage('/').percent
-            
-            return {
-                "cpu": f"{cpu_percent}%",
-                "mem": f"{mem_percent}%",
-                "disk": f"{disk_percent}%"
-            }
+            # 📊 复用缓存的采样结果
+            self._sample_metrics()
+            return dict(self._metrics_cache["display"])
         except Exception as e:
             logger.error(f"❌ 获取系统指标失败: {str(e)}")
             return {"cpu": "N/A", "mem": "N/A", "disk": "N/A"}
@@ -265,14 +660,22 @@ class SystemMaintenance:
     def get_version_history(self) -> List[str]:
         """📜 获取版本历史"""
         try:
-            with open(self.version_history_file, "r") as f:
-                history = f.readlines()
-            logger.info(f"📜 版本历史已加载: {len(history)} 条记录")
-            return history
+            if self._version_cache is None:
+                with open(self.version_history_file, "r") as f:
+                    self._version_cache = f.readlines()
+                logger.info(f"📜 版本历史已加载: {len(self._version_cache)} 条记录")
+            return list(self._version_cache)
         except Exception as e:
             logger.error(f"❌ 获取版本历史失败: {str(e)}")
             return []
     
+    def _append_version_history(self, line: str):
+        """📝 追加一条版本历史 (同时写入文件和内存缓存)"""
+        with open(self.version_history_file, "a") as f:
+            f.write(line)
+        if self._version_cache is not None:
+            self._version_cache.append(line)
+    
     def upgrade_system(self, new_version: str) -> Tuple[bool, str]:
         """
         ⬆️ 升级系统到新版本
@@ -287,17 +690,16 @@ class SystemMaintenance:
         
         try:
             # 1. 💾 备份当前系统
-            backup_path = self.backup_data(manual=True)
-            if not backup_path:
-                return False, "❌ 备份失败，升级已取消"
+            backup_ok, backup_msg = self.backup_data(manual=True)
+            if not backup_ok:
+                return False, f"❌ 备份失败，升级已取消: {backup_msg}"
             
             # 2. 🔄 执行升级操作 (这里简化实现)
             logger.info(f"🔄 正在安装新版本: {new_version}")
             time.sleep(5)  # 🕐 模拟安装过程
             
             # 3. 📝 更新版本历史
-            with open(self.version_history_file, "a") as f:
-                f.write(f"{new_version} - {datetime.now().isoformat()} - ⬆️ 升级\n")
+            self._append_version_history(f"{new_version} - {datetime.now().isoformat()} - ⬆️ 升级\n")
             
             logger.info("✅ 系统升级完成")
             return True, "✅ 系统升级成功"
@@ -334,8 +736,7 @@ class SystemMaintenance:
             
             if success:
                 # 3. 📝 更新版本历史
-                with open(self.version_history_file, "a") as f:
-                    f.write(f"{target_version} - {datetime.now().isoformat()} - ⏪ 回滚\n")
+                self._append_version_history(f"{target_version} - {datetime.now().isoformat()} - ⏪ 回滚\n")
                 
                 logger.info("✅ 系统回滚完成")
                 return True, "✅ 系统回滚成功"
@@ -354,11 +755,18 @@ class SystemMaintenance:
         返回:
           备份文件路径 (如果找到)
         """
-        # 🔍 简化实现，实际中备份文件名会包含版本信息
-        for file in self.backup_dir.glob("backup_*.zip"):
-            if version in file.name:
-                logger.info(f"✅ 找到版本备份: {file}")
-                return file
+        # 🗂️ 先查内存索引
+        backup = self._version_to_backup.get(version)
+        if backup is not None and backup.exists():
+            logger.info(f"✅ 找到版本备份: {backup}")
+            return backup
+        
+        # 🔍 回退：文件名中包含版本信息的备份
+        with os.scandir(self.backup_dir) as it:
+            for entry in it:
+                if _is_backup_entry(entry) and version in entry.name:
+                    logger.info(f"✅ 找到版本备份: {entry.path}")
+                    return Path(entry.path)
         
         logger.warning(f"⚠️ 未找到版本备份: {version}")
         return None
@@ -374,11 +782,15 @@ class SystemMaintenance:
         返回:
         备份结果和消息
         """
+        # 🔒 同一时间只允许一个备份任务 (定期备份与手动备份互斥)
+        if not self._backup_lock.acquire(blocking=False):
+            logger.warning("⏳ 已有备份任务在执行，本次跳过")
+            return False, "⏳ 已有备份任务在执行"
+        
         try:
             # 📝 创建备份文件名 (带时间戳)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"backup_{timestamp}.zip"  # 移除非法字符 😊
-            backup_path = self.backup_dir / backup_name
+            backup_base = self.backup_dir / f"backup_{timestamp}"
             
             # 💾 备份关键数据：数据库、配置文件、向量存储
             backup_sources = [
@@ -387,9 +799,9 @@ class SystemMaintenance:
                 config.BASE_DIR / "config.py"
             ]
             
-            # 📝 创建备份
-            logger.info(f"💾 开始数据备份: {backup_path}")
-            shutil.make_archive(backup_path.with_suffix(''), 'zip', config.BASE_DIR, *backup_sources)
+            # 📝 创建备份 (流式写入，无需先在内存中汇总整个目录树)
+            logger.info(f"💾 开始数据备份: {backup_base}")
+            backup_path = _archive_sources(backup_sources, backup_base)
             
             if not backup_path.exists():
                 logger.error(f"❌ 备份文件未生成: {backup_path}")
@@ -397,15 +809,77 @@ class SystemMaintenance:
             
             # 📝 记录备份到数据库
             backup_size = backup_path.stat().st_size
-            db_manager.add_backup_record(str(backup_path), self.get_current_version(), backup_size)
+            version = self.get_current_version()
+            checksum = _file_checksum(backup_path)
+            db_manager.add_backup_record(str(backup_path), version, backup_size, checksum)
+            self._version_to_backup[version] = backup_path
             
-            # 🔄 更新备份时间
-            self.last_backup_time = time.time()
+            # ⏰ 刚完成一次完整备份，顺延下一次定期备份
+            self._next_backup_at = time.monotonic() + self.backup_interval
             logger.info(f"✅ 数据备份完成: {backup_path} ({backup_size} bytes)")
             return True, f"✅ 数据备份成功: {backup_path.name}"
         except Exception as e:
             logger.error(f"❌ 数据备份失败: {str(e)}")
             return False, f"❌ 数据备份失败: {str(e)}"
+        finally:
+            self._backup_lock.release()
+
+    def incremental_backup(self) -> Tuple[bool, str]:
+        """
+        🔗 执行增量快照备份 (定期备份使用)
+        新快照是一个目录，未变化的文件与上一份快照共享硬链接，只有新增或修改的文件产生IO
+        
+        返回:
+          (成功状态, 消息)
+        """
+        # 🔒 同一时间只允许一个备份任务 (定期备份与手动备份互斥)
+        if not self._backup_lock.acquire(blocking=False):
+            logger.warning("⏳ 已有备份任务在执行，本次跳过")
+            return False, "⏳ 已有备份任务在执行"
+        
+        try:
+            snapshot_dir, prev_dir, backup_sources = self._prepare_snapshot()
+            total_size, copied_size = _snapshot_sources(backup_sources, snapshot_dir, prev_dir)
+            self._record_snapshot(snapshot_dir, total_size, copied_size)
+            return True, f"✅ 增量备份成功: {snapshot_dir.name}"
+        except Exception as e:
+            logger.error(f"❌ 增量备份失败: {str(e)}")
+            return False, f"❌ 增量备份失败: {str(e)}"
+        finally:
+            self._backup_lock.release()
+
+    def _prepare_snapshot(self) -> Tuple[Path, Optional[Path], List[Path]]:
+        """
+        🔗 创建新快照目录并确定增量基准
+        返回:
+          (新快照目录, 上一份快照目录, 备份源列表)
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        snapshot_dir = self.backup_dir / f"backup_{timestamp}"
+        snapshot_dir.mkdir(parents=True)
+        
+        # 🔍 上一份快照：按目录名中的时间戳取最新一份
+        snapshots = sorted(
+            p for p in self.backup_dir.glob("backup_*") if (p / "manifest.json").exists()
+        )
+        prev_dir = snapshots[-1] if snapshots else None
+        
+        backup_sources = [
+            config.DB_DIR,
+            config.VECTOR_STORE_DIR,
+            config.BASE_DIR / "config.py"
+        ]
+        
+        logger.info(f"🔗 开始增量备份: {snapshot_dir} (基于: {prev_dir.name if prev_dir else '无'})")
+        return snapshot_dir, prev_dir, backup_sources
+
+    def _record_snapshot(self, snapshot_dir: Path, total_size: int, copied_size: int):
+        """📝 记录已完成的快照：写入备份记录、更新版本索引并顺延下一次定期备份"""
+        version = self.get_current_version()
+        db_manager.add_backup_record(str(snapshot_dir), version, total_size)
+        self._version_to_backup[version] = snapshot_dir
+        self._next_backup_at = time.monotonic() + self.backup_interval
+        logger.info(f"✅ 增量备份完成: {snapshot_dir} (共 {total_size} bytes, 本次复制 {copied_size} bytes)")
 
     def restore_data(self, backup_file: Path) -> Tuple[bool, str]:
         """
@@ -422,39 +896,68 @@ class SystemMaintenance:
         try:
             logger.info(f"🔄 开始数据恢复: {backup_file}")
             
-            # 📝 创建临时解压目录
-            temp_dir = self.backup_dir / "temp_restore"
-            temp_dir.mkdir(exist_ok=True, parents=True)
+            # 📦 先把备份内容准备到与目标同一文件系统的暂存目录，再整体替换
+            # (归档直接解压到暂存目录；快照目录需保留，克隆一份到暂存目录)
+            staging_dir = config.BASE_DIR / "restore_staging"
+            if staging_dir.exists():
+                shutil.rmtree(staging_dir)
+            staging_dir.mkdir(parents=True)
             
-            # 📦 解压备份文件
-            shutil.unpack_archive(backup_file, temp_dir, 'zip')
+            if backup_file.is_dir():
+                for name in (config.DB_DIR.name, config.VECTOR_STORE_DIR.name):
+                    if (backup_file / name).exists():
+                        _fast_copytree(backup_file / name, staging_dir / name)
+                if (backup_file / "config.py").exists():
+                    _clone_file(backup_file / "config.py", staging_dir / "config.py")
+            else:
+                # 🔐 解压前校验归档完整性 (有校验和记录时)
+                expected = db_manager.get_backup_checksum(str(backup_file))
+                if expected and _file_checksum(backup_file, expected.split(":", 1)[0]) != expected:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                    logger.error(f"❌ 备份文件校验失败: {backup_file}")
+                    return False, "❌ 备份文件校验失败，文件可能已损坏"
+                _extract_archive(backup_file, staging_dir)
             
-            # 🔄 恢复数据库
-            db_backup = temp_dir / config.DB_DIR.name
-            if db_backup.exists():
-                logger.info("🔄 正在恢复数据库...")
-                # 🧹 清空现有数据库目录
-                if config.DB_DIR.exists():
-                    shutil.rmtree(config.DB_DIR)
-                shutil.copytree(db_backup, config.DB_DIR)
+            # 🔌 知识库维护模块持有长连接，交换期间先关闭，完成后在新数据库上重新打开
+            from modules.knowledge_base_maintenance import kb_maintenance
             
-            # 🔄 恢复向量存储
-            vector_backup = temp_dir / config.VECTOR_STORE_DIR.name
-            if vector_backup.exists():
-                logger.info("🔄 正在恢复向量存储...")
-                # 🧹 清空现有向量存储目录
-                if config.VECTOR_STORE_DIR.exists():
-                    shutil.rmtree(config.VECTOR_STORE_DIR)
-                shutil.copytree(vector_backup, config.VECTOR_STORE_DIR)
+            with kb_maintenance.suspended_connections():
+                # 🔄 逐个目录做重命名交换：目标 -> *_old，暂存 -> 目标；任一步失败则全部换回
+                swaps = [
+                    (staging_dir / config.DB_DIR.name, config.DB_DIR, "数据库"),
+                    (staging_dir / config.VECTOR_STORE_DIR.name, config.VECTOR_STORE_DIR, "向量存储"),
+                ]
+                swapped = []
+                try:
+                    for staged, target, label in swaps:
+                        if not staged.exists():
+                            continue
+                        logger.info(f"🔄 正在恢复{label}...")
+                        old = target.with_name(f"{target.name}_old")
+                        if old.exists():
+                            shutil.rmtree(old)
+                        if target.exists():
+                            os.rename(target, old)
+                        swapped.append((target, old))
+                        os.rename(staged, target)
+                except Exception:
+                    for target, old in reversed(swapped):
+                        if old.exists():
+                            if target.exists():
+                                shutil.rmtree(target)
+                            os.rename(old, target)
+                    raise
             
-            # 🔄 恢复配置文件
-            config_backup = temp_dir / "config.py"
+            # 🔄 恢复配置文件 (原子替换)
+            config_backup = staging_dir / "config.py"
             if config_backup.exists():
                 logger.info("🔄 正在恢复配置文件...")
-                shutil.copy(config_backup, config.BASE_DIR / "config.py")
+                os.replace(config_backup, config.BASE_DIR / "config.py")
             
-            # 🧹 清理临时目录
-            shutil.rmtree(temp_dir)
+            # 🧹 清理被替换下来的旧目录和暂存目录
+            for _, old in swapped:
+                shutil.rmtree(old, ignore_errors=True)
+            shutil.rmtree(staging_dir, ignore_errors=True)
             
             logger.info("✅ 数据恢复完成")
             return True, "✅ 数据恢复成功"
@@ -463,29 +966,68 @@ class SystemMaintenance:
             return False, f"❌ 数据恢复失败: {str(e)}"
     
     def find_last_backup(self) -> Optional[Path]:
-        """🔍 查找最新的备份文件"""
-        backups = list(self.backup_dir.glob("💾 backup_*.zip"))
-        if backups:
-            # 🕐 按修改时间排序，获取最新的备份
-            backups.sort(key=os.path.getmtime, reverse=True)
-            latest_backup = backups[0]
-            logger.info(f"✅ 找到最新备份: {latest_backup}")
-            return latest_backup
+        """🔍 查找最新的备份文件 (归档文件或增量快照目录)"""
+        # 🕐 单次目录扫描，按修改时间取最新 (DirEntry 缓存了 stat 结果)
+        with os.scandir(self.backup_dir) as it:
+            latest = max(
+                (entry for entry in it if _is_backup_entry(entry)),
+                key=lambda entry: entry.stat().st_mtime,
+                default=None
+            )
+        if latest is not None:
+            logger.info(f"✅ 找到最新备份: {latest.path}")
+            return Path(latest.path)
         
         logger.warning("⚠️ 未找到备份文件")
         return None
     
     def periodic_backup(self):
-        """🔄 定期备份数据"""
-        current_time = time.time()
-        if current_time - self.last_backup_time > self.backup_interval:
+        """🔄 定期备份数据：增量快照在独立的备份进程中生成，完成后由回调记录结果"""
+        if not self._backup_lock.acquire(blocking=False):
+            logger.warning("⏳ 已有备份任务在执行，本次定期备份跳过")
+            return
+        
+        try:
             logger.info("🤖 执行定期备份...")
-            backup_path = self.backup_data()
-            if backup_path:
-                logger.info("✅ 定期备份完成")
-            else:
-                logger.error("❌ 定期备份失败")
+            snapshot_dir, prev_dir, backup_sources = self._prepare_snapshot()
+            
+            if self._backup_pool is None:
+                # 🧵 当前进程含多个线程，fork 可能复制到被其他线程持有的锁；改用 forkserver (Windows 无此方式，使用 spawn)
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._backup_pool = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context(start_method)
+                )
+            future = self._backup_pool.submit(_snapshot_sources, backup_sources, snapshot_dir, prev_dir)
+            future.add_done_callback(functools.partial(self._on_backup_done, snapshot_dir))
+        except Exception as e:
+            self._backup_lock.release()
+            logger.error(f"❌ 定期备份失败: {str(e)}")
+    
+    def _on_backup_done(self, snapshot_dir: Path, future):
+        """📝 备份进程完成后的回调：记录结果并释放备份锁"""
+        try:
+            total_size, copied_size = future.result()
+            self._record_snapshot(snapshot_dir, total_size, copied_size)
+            logger.info("✅ 定期备份完成")
+        except Exception as e:
+            # 🧹 未完成的快照没有清单，不会被当作增量基准，直接清理
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            logger.error(f"❌ 定期备份失败: {str(e)}")
+        finally:
+            self._backup_lock.release()
+
+
+# 🌍 全局系统维护实例 (首次使用时创建：仅导入模块不会建目录、启动监控线程)
+_system_maintenance: Optional[SystemMaintenance] = None
+_system_maintenance_lock = threading.Lock()
 
 
-# 🌍 全局系统维护实例
-system_maintenance = SystemMaintenance()
\ No newline at end of file
+def get_system_maintenance() -> SystemMaintenance:
+    """🌍 获取全局系统维护实例 (首次调用时初始化)"""
+    global _system_maintenance
+    if _system_maintenance is None:
+        with _system_maintenance_lock:
+            if _system_maintenance is None:
+                _system_maintenance = SystemMaintenance()
+    return _system_maintenance
@@ -4,11 +4,15 @@
 包括会话管理、消息处理、文件上传等
 """
 
+import asyncio
 import datetime
-import random
+import functools
+import itertools
+import logging
 import re
+import secrets
 import uuid
-from typing import Any
+from typing import Any, AsyncIterator
 import gradio as gr
 from pathlib import Path
 from config import config
@@ -24,6 +28,93 @@ from modules import (
 )
 
 
+# 🆔 会话ID格式校验 (会话ID均为 str(uuid.uuid4()) 生成的标准格式)
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z", re.I)
+
+# 📱 手机号格式校验 (11位数字)
+_PHONE_RE = re.compile(r"\A[0-9]{11}\Z")
+
+
+def _is_uuid(s: str) -> bool:
+    """🆔 判断字符串是否为标准格式的UUID，无效输入不抛异常"""
+    return bool(s) and _UUID_RE.match(s) is not None
+
+
+# 🙈 不变的界面更新对象，模块加载时构建一次 (均不含value，Gradio处理时不会修改)
+_HIDE = gr.update(visible=False)
+_HIDE3 = (_HIDE, _HIDE, _HIDE)
+_NOOP_12 = (gr.update(),) * 12
+
+# 📁 支持的上传文件格式集合 (配置中保留列表以便按顺序展示)
+_SUPPORTED_FORMATS = frozenset(config.SUPPORTED_FILE_FORMATS)
+
+# 📌 每个用户最近使用的会话ID (创建/切换/登录时更新)，Radio空值回退时无需查询数据库
+_latest_sid: dict[str, str] = {}
+
+
+def _rows_to_history(rows) -> list[dict[str, str]]:
+    """💬 把消息行 [(role, content, ...), ...] 转换为Chatbot消息格式 [{"role", "content"}, ...]"""
+    return [{"role": row[0], "content": row[1]} for row in rows]
+
+
+def _session_group_key(today: datetime.date):
+    """
+    📊 生成按创建时间分组的 groupby 键函数
+    ISO日期字符串可直接按字典序比较，分组边界只计算一次，逐行比较无需解析时间
+    """
+    today_s = today.isoformat()
+    yesterday_s = (today - datetime.timedelta(days=1)).isoformat()
+    last_week_s = (today - datetime.timedelta(days=7)).isoformat()
+    
+    def group_of(row: tuple[str, str, str]) -> str:
+        created_day = row[2][:10]
+        if created_day == today_s:
+            return "今天"
+        if created_day == yesterday_s:
+            return "昨天"
+        if created_day >= last_week_s:
+            return "前7天"
+        return "更早"
+    
+    return group_of
+
+
+@functools.lru_cache(maxsize=256)
+def _build_session_choices(phone: str, version: int, today: datetime.date) -> tuple[tuple[str, str], ...]:
+    """
+    🏗️ 构建会话选择列表 (按 (手机号, 会话版本号, 日期) 缓存)
+    会话创建/重命名/删除时版本号递增，旧缓存自然失效；日期参与缓存键保证跨天后分组正确
+    """
+    # 📋 一次查询取回全部会话 (已按创建时间倒序)，分组在内存中完成
+    rows = chat_management.chat_manager.get_sessions(phone)
+    
+    # 🆕 只有真正没有会话时才创建默认会话
+    if not rows:
+        default_sid = chat_management.chat_manager.ensure_user_has_session(phone)
+        created_time = datetime.datetime.now().strftime("%m-%d %H:%M")
+        display_text = f"💬 欢迎使用 • {created_time}"
+        logger.info("🆕 为新用户%s创建默认会话: UUID=%s", phone, default_sid)
+        return ((display_text, default_sid),)
+    
+    session_choices = []
+    
+    # 🏗️ 倒序的会话按时间分组后天然连续，直接用 groupby 切分
+    # 创建时间是ISO字符串 (YYYY-MM-DDTHH:MM:SS...)，显示用的 "月-日 时:分" 直接切片得到
+    for group_name, group_iter in itertools.groupby(rows, key=_session_group_key(today)):
+        group_sessions = list(group_iter)
+        
+        # 📂 添加分组标题
+        session_choices.append((f"--- 📂 {group_name} ({len(group_sessions)}) ---", "__GROUP__"))
+        
+        # 📋 添加该分组下的所有会话
+        session_choices.extend(
+            (f"💬 {title} • {created[5:10]} {created[11:16]}", sid)
+            for sid, title, created in group_sessions
+        )
+    
+    return tuple(session_choices)
+
+
 class SessionManager:
     """🗂️ 会话管理器 - 负责管理用户的聊天会话"""
     
@@ -44,44 +135,24 @@ class SessionManager:
             return [("💬 欢迎使用", "__DEFAULT__")]
         
         try:
-            # 📋 获取分组后的会话
-            grouped_sessions = chat_management.chat_manager.get_grouped_sessions(phone)
-            session_choices = []
-            
-            # 🏗️ 按分组添加会话到选择列表
-            for group_name, group_sessions in grouped_sessions.items():
-                if group_sessions:
-                    # 📂 添加分组标题
-                    session_choices.append((f"--- 📂 {group_name} ({len(group_sessions)}) ---", "__GROUP__"))
-                    
-                    # 📋 添加该分组下的所有会话
-                    for session in group_sessions:
-                        created_time = session["created"].strftime("%m-%d %H:%M")
-                        display_text = f"💬 {session['title']} • {created_time}"
-                        session_choices.append((display_text, session["sid"]))
-            
-            # 🆕 如果没有会话，创建默认会话
-            if not session_choices:
-                # 创建默认会话而不是返回空列表
-                default_sid = chat_management.chat_manager.ensure_user_has_session(phone)
-                created_time = datetime.datetime.now().strftime("%m-%d %H:%M")
-                display_text = f"💬 欢迎使用 • {created_time}"
-                session_choices = [(display_text, default_sid)]
-                logger.info(f"🆕 为新用户{phone}创建默认会话: UUID={default_sid}")
-            
-            # 🎯 确保至少有一个有效选项
-            if not session_choices:
-                session_choices = [("💬 欢迎使用", "__DEFAULT__")]
-            
-            logger.info(f"📋 构建会话选择列表完成: 用户={phone}, 会话数={len([c for c in session_choices if c[1] not in ['__GROUP__', '__DEFAULT__']])}")
+            # 🗂️ 会话列表未变化 (版本号相同且仍是同一天) 时直接复用缓存结果
+            version = chat_management.chat_manager.session_version(phone)
+            today = datetime.datetime.now().date()
+            session_choices = list(_build_session_choices(phone, version, today))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "📋 构建会话选择列表完成: 用户=%s, 会话数=%s",
+                    phone, sum(1 for c in session_choices if c[1] != '__GROUP__')
+                )
             return session_choices
             
         except Exception as e:
-            logger.error(f"❌ 构建会话列表失败: {str(e)}")
+            logger.error("❌ 构建会话列表失败: %s", e)
             # 🎯 返回默认选项而不是空列表
             return [("💬 欢迎使用", "__DEFAULT__")]
 
     @staticmethod
+    @chat_management.request_scoped
     def create_new_session(phone: str) -> tuple[str, list, Any, Any, Any, Any]:
         """
         ➕ 创建新会话并立即预加载所有会话数据
@@ -93,39 +164,40 @@ class SessionManager:
             包含新会话信息的元组
         """
         if not phone:
-            return "", [], gr.update(), gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            return "", [], gr.update(), *_HIDE3
         
         try:
             # ➕ 创建新会话（自动生成UUID）
             sid = chat_management.chat_manager.create_session(phone)
             
             # 🎯 记录会话创建事件
-            logger.info(f"🆕 [CREATE_SESSION] 用户={phone} 创建新会话: UUID={sid}")
+            logger.info("🆕 [CREATE_SESSION] 用户=%s 创建新会话: UUID=%s", phone, sid)
+            _latest_sid[phone] = sid
             
             # 🔄 获取更新后的会话列表
             session_choices = SessionManager.build_session_choices(phone)
             
-            # 📋 获取新会话的所有消息
-            messages = chat_management.chat_manager.get_messages(sid, limit=None)
-            history = [{"role": role, "content": content} for role, content, _ in messages]
+            # 📋 获取新会话的所有消息 (创建时的自动重命名检查已读取过，直接复用)
+            messages = chat_management.chat_manager.get_messages_cached(sid)
+            history = _rows_to_history(messages)
             
-            logger.info(f"✅ 创建新会话成功: 用户={phone}, 会话UUID={sid}")
+            logger.info("✅ 创建新会话成功: 用户=%s, 会话UUID=%s", phone, sid)
             
             return (
                 history,
                 sid,
                 gr.update(choices=session_choices, value=sid),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False)
+                _HIDE,
+                _HIDE,
+                _HIDE
             )
             
         except Exception as e:
-            logger.error(f"❌ 创建新会话失败: {str(e)}")
-            return "", [], gr.update(), gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            logger.error("❌ 创建新会话失败: %s", e)
+            return "", [], gr.update(), *_HIDE3
 
     @staticmethod
-    def switch_session(new_sid: str, phone: str) -> tuple[list[dict[str, str]], str, Any, Any, Any]:
+    async def switch_session(new_sid: str, phone: str) -> tuple[list[dict[str, str]], str, Any, Any, Any]:
         """
         🔄 切换会话 - 修复返回值数量问题
         
@@ -138,43 +210,41 @@ class SessionManager:
         """
         # 🛡️ 输入验证：处理None值
         if new_sid is None or not new_sid or new_sid == "__GROUP__":
-            logger.warning(f"⚠️ [SWITCH_SESSION] 无效会话ID: {new_sid}")
+            logger.warning("⚠️ [SWITCH_SESSION] 无效会话ID: %s", new_sid)
             # 返回5个值，确保数量匹配
-            return [], "", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            return [], "", *_HIDE3
         
         # 🔍 严格验证UUID格式
-        try:
-            uuid.UUID(str(new_sid))
-            sid_str = str(new_sid)
-        except (ValueError, TypeError):
-            logger.error(f"❌ [SWITCH_SESSION] 无效的UUID格式: {new_sid}")
-            return [], "", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+        sid_str = str(new_sid)
+        if not _is_uuid(sid_str):
+            logger.error("❌ [SWITCH_SESSION] 无效的UUID格式: %s", new_sid)
+            return [], "", *_HIDE3
         
         try:
-            logger.info(f"🔄 [SWITCH_SESSION] 开始切换会话: 用户={phone}, 会话UUID={sid_str}")
+            logger.info("🔄 [SWITCH_SESSION] 开始切换会话: 用户=%s, 会话UUID=%s", phone, sid_str)
             
-            # 📋 获取会话消息
-            messages = chat_management.chat_manager.get_messages(sid_str)
+            # 📋 获取会话消息 (在线程池中查询，不阻塞事件循环)
+            messages = await asyncio.to_thread(chat_management.chat_manager.get_messages, sid_str)
+            if phone:
+                _latest_sid[phone] = sid_str
             
             # 🏗️ 构建聊天历史
-            chat_history = []
-            for role, content, _ in messages:
-                chat_history.append({"role": role, "content": content})
+            chat_history = _rows_to_history(messages)
             
-            logger.info(f"✅ [SWITCH_SESSION] 切换会话完成: 用户={phone}, 会话UUID={sid_str}, 消息数={len(chat_history)}")
+            logger.info("✅ [SWITCH_SESSION] 切换会话完成: 用户=%s, 会话UUID=%s, 消息数=%s", phone, sid_str, len(chat_history))
             
             # 🎯 关键：返回5个值，与Gradio组件匹配
             return (
                 chat_history,                    # [1] 聊天历史
                 sid_str,                        # [2] 当前会话ID
-                gr.update(visible=False),        # [3] 后续问题按钮1
-                gr.update(visible=False),        # [4] 后续问题按钮2
-                gr.update(visible=False)         # [5] 后续问题按钮3
+                _HIDE,                           # [3] 后续问题按钮1
+                _HIDE,                           # [4] 后续问题按钮2
+                _HIDE                            # [5] 后续问题按钮3
             )
             
         except Exception as e:
-            logger.error(f"❌ [SWITCH_SESSION] 切换会话失败: 用户={phone}, 会话={new_sid}, 错误={str(e)}")
-            return [], "", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            logger.error("❌ [SWITCH_SESSION] 切换会话失败: 用户=%s, 会话=%s, 错误=%s", phone, new_sid, e)
+            return [], "", *_HIDE3
 
     @staticmethod
     def get_latest_or_create_session(phone: str) -> str:
@@ -192,15 +262,15 @@ class SessionManager:
         
         try:
             sid = chat_management.chat_manager.ensure_user_has_session(phone)
-            logger.info(f"✅ 获取会话成功: 用户={phone}, 会话ID={sid}")
+            logger.info("✅ 获取会话成功: 用户=%s, 会话ID=%s", phone, sid)
             return sid
             
         except Exception as e:
-            logger.error(f"❌ 获取会话失败: {str(e)}")
+            logger.error("❌ 获取会话失败: %s", e)
             return ""
 
     @staticmethod
-    def refresh_session_list(phone: str) -> Any:
+    async def refresh_session_list(phone: str) -> Any:
         """
         🔄 刷新会话列表
         
@@ -215,16 +285,20 @@ class SessionManager:
         
         try:
             # 🔄 获取更新后的会话列表
-            session_choices = SessionManager.build_session_choices(phone)
-            logger.info(f"🔄 会话列表刷新完成: 用户={phone}, 会话数={len([c for c in session_choices if c[1] != '__GROUP__'])}")
+            session_choices = await asyncio.to_thread(SessionManager.build_session_choices, phone)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "🔄 会话列表刷新完成: 用户=%s, 会话数=%s",
+                    phone, sum(1 for c in session_choices if c[1] != '__GROUP__')
+                )
             return gr.update(choices=session_choices)
             
         except Exception as e:
-            logger.error(f"❌ 刷新会话列表失败: {str(e)}")
+            logger.error("❌ 刷新会话列表失败: %s", e)
             return gr.update()
 
     @staticmethod
-    def safe_switch_session(new_sid: str, phone: str) -> tuple:
+    async def safe_switch_session(new_sid: str, phone: str) -> tuple:
         """
         🔒 安全的会话切换方法 - 修复Radio值问题
         
@@ -240,32 +314,29 @@ class SessionManager:
         
         # 🎯 处理Radio组件的空值问题
         if new_sid is None or new_sid == [] or new_sid == "__GROUP__":
-            logger.warning(f"⚠️ [SAFE_SWITCH] 处理无效Radio值: {new_sid}")
+            logger.warning("⚠️ [SAFE_SWITCH] 处理无效Radio值: %s", new_sid)
             
-            # 🔄 获取用户的最新会话作为默认值
-            sessions = chat_management.chat_manager.get_sessions(safe_phone)
-            if sessions:
-                safe_sid = sessions[0][0]  # 最新的会话
-            else:
-                # 🆕 创建默认会话
-                safe_sid = chat_management.chat_manager.ensure_user_has_session(safe_phone)
+            # 🔄 回退到用户最近使用的会话，没有记录时取最新会话 (必要时创建)
+            safe_sid = _latest_sid.get(safe_phone)
+            if not safe_sid:
+                safe_sid = await asyncio.to_thread(chat_management.chat_manager.ensure_user_has_session, safe_phone)
+                if safe_phone and safe_sid:
+                    _latest_sid[safe_phone] = safe_sid
             
             # 📋 获取默认会话的内容
-            messages = chat_management.chat_manager.get_messages(safe_sid)
-            chat_history = [{"role": role, "content": content} for role, content, _ in messages]
+            messages = await asyncio.to_thread(chat_management.chat_manager.get_messages, safe_sid)
+            chat_history = _rows_to_history(messages)
             
-            return chat_history, safe_sid, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            return chat_history, safe_sid, *_HIDE3
         
         # 🔍 验证会话ID格式
-        try:
-            uuid.UUID(str(new_sid))
-            safe_sid = str(new_sid)
-        except (ValueError, TypeError):
-            logger.error(f"❌ [SAFE_SWITCH] 无效的UUID格式: {new_sid}")
-            return [], str(new_sid), gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+        safe_sid = str(new_sid)
+        if not _is_uuid(safe_sid):
+            logger.error("❌ [SAFE_SWITCH] 无效的UUID格式: %s", new_sid)
+            return [], str(new_sid), *_HIDE3
         
         # 🔄 正常的会话切换逻辑
-        return SessionManager.switch_session(safe_sid, safe_phone)
+        return await SessionManager.switch_session(safe_sid, safe_phone)
 
     # 🛠️ 修复：确保传入的是UUID字符串，而非历史对象
     @staticmethod
@@ -275,12 +346,8 @@ class SessionManager:
             return str(sid["sid"])
         if isinstance(sid, list) and len(sid) == 1 and isinstance(sid[0], str):
             return str(sid[0])
-        if isinstance(sid, str):
-            try:
-                uuid.UUID(sid)
-                return sid
-            except ValueError:
-                pass
+        if isinstance(sid, str) and _is_uuid(sid):
+            return sid
         return str(uuid.uuid4())  # 兜底：生成新UUID
 
 
@@ -288,14 +355,16 @@ class MessageHandler:
     """💬 消息处理器 - 处理用户发送的消息"""
     
     @staticmethod
-    def process_message(
+    async def process_message(
         text: str, 
         sid: str,
         phone: str, 
         chat_history: list[dict[str, str]]
-    ) -> tuple[list[dict[str, str]], str, str, Any, Any, Any]:
+    ) -> AsyncIterator[tuple[list[dict[str, str]], str, str, Any, Any, Any]]:
         """
         💬 处理用户消息 - 确保每条消息都实时保存
+        异步处理：数据库读写、意图识别和大模型调用都放到线程池执行，不阻塞事件循环
+        分两次输出：用户消息立即显示在对话框中，回复生成后再输出完整结果
         
         参数:
             text: 用户输入的文本
@@ -303,7 +372,7 @@ class MessageHandler:
             phone: 用户手机号
             chat_history: 当前聊天历史
             
-        返回:
+        产出:
             包含新消息、清空输入框、会话ID、预测问题的元组
         """
         # 🧹 清理输入文本
@@ -311,82 +380,92 @@ class MessageHandler:
         
         # 🛡️ 检查空消息
         if not text:
-            return chat_history, "", sid, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            yield chat_history, "", sid, *_HIDE3
+            return
         
         # 📝 确保会话ID是字符串格式（UUID）
         sid_str = str(sid) if sid else ""
         
+        # 📋 界面上的聊天历史即当前会话的完整记录，本轮在其基础上追加，无需查询数据库
+        history = [(msg["role"], msg["content"]) for msg in chat_history or []]
+        
         # 🔍 验证UUID格式
-        try:
-            uuid.UUID(sid_str)
-            logger.info(f"💬 开始处理消息: 用户={phone}, 会话={sid_str}")
-        except (ValueError, TypeError):
+        if _is_uuid(sid_str):
+            logger.info("💬 开始处理消息: 用户=%s, 会话=%s", phone, sid_str)
+        else:
             # ❌ 无效的会话ID，创建新会话
-            logger.warning(f"⚠️ 无效的会话ID格式: {sid}, 创建新会话")
-            sid_str = chat_management.chat_manager.create_session(phone)
-            logger.info(f"🆕 创建新会话处理消息: 用户={phone}, 会话ID={sid_str}")
+            logger.warning("⚠️ 无效的会话ID格式: %s, 创建新会话", sid)
+            sid_str = await asyncio.to_thread(chat_management.chat_manager.create_session, phone)
+            logger.info("🆕 创建新会话处理消息: 用户=%s, 会话ID=%s", phone, sid_str)
+            
+            # 📋 新会话只有欢迎消息，界面上的旧历史不属于它
+            history = [
+                (row[0], row[1])
+                for row in await asyncio.to_thread(chat_management.chat_manager.get_messages, sid_str)
+            ]
+        
+        # 💬 先把用户消息显示出来并清空输入框，等待回复期间界面不再停滞
+        yield (
+            _rows_to_history(history) + [{"role": "user", "content": text}],
+            "",
+            sid_str,
+            *_HIDE3
+        )
         
+        base_len = len(history)
         try:
-            # 1. 💾 立即保存用户消息到数据库
-            chat_management.chat_manager.add_message(sid, "user", text)
+            # 1. 💾 立即保存用户消息，同时 🎯 识别用户意图 (两者互不依赖，并发执行)
+            _, intent = await asyncio.gather(
+                asyncio.to_thread(chat_management.chat_manager.add_message, sid_str, "user", text),
+                asyncio.to_thread(intent_recognition.intent_recognizer.recognize, text),
+            )
             logger.debug("💾 用户消息已保存")
+            logger.info("🎯 识别到意图: 意图=%s, 用户=%s, 会话=%s", intent, phone, sid_str)
             
-            # 2. 📋 获取完整对话历史（包含刚保存的消息）
-            db_messages = chat_management.chat_manager.get_messages(sid)
-            
-            # 3. 📝 格式化历史记录给意图识别器
-            formatted_messages = []
-            for msg in db_messages:
-                if len(msg) >= 2:
-                    role, content = msg[0], msg[1]
-                    formatted_messages.append((role, content))
+            # 2. 📝 追加用户消息，作为给意图路由器的完整对话历史
+            history.append(("user", text))
             
-            # 4. 🎯 识别用户意图
-            intent = intent_recognition.intent_recognizer.recognize(text)
-            logger.info(f"🎯 识别到意图: 意图={intent}, 用户={phone}, 会话={sid}")
-            
-            # 5. 🚀 路由到对应处理器生成回复
-            reply = intent_router.intent_router.route(intent, text, sid, formatted_messages)
-            logger.info(f"🤖 生成回复: 用户={phone}, 会话={sid}, 回复长度: {len(reply)}")
+            # 3. 🚀 路由到对应处理器生成回复
+            reply = await asyncio.to_thread(
+                intent_router.intent_router.route, intent, text, sid_str, history
+            )
+            logger.info("🤖 生成回复: 用户=%s, 会话=%s, 回复长度: %s", phone, sid_str, len(reply))
             
-            # 6. 💾 立即保存AI回复到数据库
-            chat_management.chat_manager.add_message(sid, "assistant", reply)
+            # 4. 💾 立即保存AI回复到数据库
+            await asyncio.to_thread(chat_management.chat_manager.add_message, sid_str, "assistant", reply)
             logger.debug("💾 AI回复已保存")
             
-            # 7. 📋 获取更新后的完整消息列表
-            updated_messages = chat_management.chat_manager.get_messages(sid)
-            new_history = []
-            for role, content, _ in updated_messages:
-                new_history.append({"role": role, "content": content})
-            
-            # 8. 🔮 预测后续问题
-            recent_history = []
-            for role, content, _ in updated_messages[-10:]:
-                recent_history.append((role, content))
+            # 5. 📋 在内存中追加AI回复，无需重新查询数据库
+            history.append(("assistant", reply))
+            new_history = _rows_to_history(history)
             
-            predicted_questions = next_questions.question_predictor.predict(text, recent_history)
-            logger.info(f"🔮 预测后续问题: 用户={phone}, 会话={sid}, 问题={predicted_questions}")
+            # 6. 🔮 预测后续问题
+            recent_history = history[-10:]
+            predicted_questions = await asyncio.to_thread(
+                next_questions.question_predictor.predict, text, recent_history
+            )
+            logger.info("🔮 预测后续问题: 用户=%s, 会话=%s, 问题=%s", phone, sid_str, predicted_questions)
             
-            # 9. 🔄 更新后续问题按钮
+            # 7. 🔄 更新后续问题按钮
             btn_updates = MessageHandler._update_next_question_buttons(predicted_questions)
             
         except Exception as e:
             # ❌ 错误处理
-            logger.error(f"❌ 消息处理失败: 用户={phone}, 会话={sid}, 错误={str(e)}")
+            logger.error("❌ 消息处理失败: 用户=%s, 会话=%s, 错误=%s", phone, sid_str, e)
             error_reply = config.i18n.get('error_occurred')
             
             # 💾 保存错误回复
-            chat_management.chat_manager.add_message(sid, "assistant", error_reply)
-            
-            # 📋 获取包含错误回复的完整消息列表
-            updated_messages = chat_management.chat_manager.get_messages(sid)
-            new_history = []
-            for role, content, _ in updated_messages:
-                new_history.append({"role": role, "content": content})
-            btn_updates = (gr.update(visible=False), gr.update(visible=False), gr.update(visible=False))
+            await asyncio.to_thread(chat_management.chat_manager.add_message, sid_str, "assistant", error_reply)
+            
+            # 📋 在内存中追加错误回复
+            if len(history) == base_len:
+                history.append(("user", text))
+            history.append(("assistant", error_reply))
+            new_history = _rows_to_history(history)
+            btn_updates = _HIDE3
         
-        logger.info(f"✅ 消息处理完成: 用户={phone}, 会话={sid}, 总消息数={len(new_history)}")
-        return new_history, "", sid, *btn_updates
+        logger.info("✅ 消息处理完成: 用户=%s, 会话=%s, 总消息数=%s", phone, sid_str, len(new_history))
+        yield new_history, "", sid_str, *btn_updates
     
     @staticmethod
     def _update_next_question_buttons(questions: list[str]) -> tuple[Any, Any, Any]:
@@ -401,7 +480,7 @@ class MessageHandler:
         """
         if not questions or len(questions) == 0:
             # 🙈 没有预测问题时，隐藏所有按钮
-            return gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            return _HIDE3
         
         # ✂️ 确保最多3个问题
         questions = questions[:3]
@@ -413,17 +492,17 @@ class MessageHandler:
         
         # 🙈 填充剩余按钮为隐藏状态
         while len(btn_updates) < 3:
-            btn_updates.append(gr.update(visible=False))
+            btn_updates.append(_HIDE)
         
         return tuple(btn_updates)
     
     @staticmethod
-    def select_next_question(
+    async def select_next_question(
         question: str, 
         sid: str, 
         phone: str, 
         history: list[dict[str, str]]
-    ) -> tuple[list[dict[str, str]], str, str, Any, Any, Any]:
+    ) -> AsyncIterator[tuple[list[dict[str, str]], str, str, Any, Any, Any]]:
         """
         🎯 选择并发送预测的问题
         
@@ -433,21 +512,23 @@ class MessageHandler:
             phone: 用户手机号
             history: 当前聊天历史
             
-        返回:
+        产出:
             处理后的消息结果
         """
         # 📝 直接使用UUID格式的会话ID
-        logger.info(f"🎯 选择预测问题: 问题='{question}', 会话={sid}")
+        logger.info("🎯 选择预测问题: 问题='%s', 会话=%s", question, sid)
         
         # 🛡️ 空问题不处理
         if not question or question.strip() == "":
-            return history, "", sid, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            yield history, "", sid, *_HIDE3
+            return
         
         # 🔄 使用现有的消息处理逻辑
-        return MessageHandler.process_message(question, sid, phone, history)
+        async for update in MessageHandler.process_message(question, sid, phone, history):
+            yield update
 
     @staticmethod
-    def build_session_content(sid: str, phone: str) -> list[dict[str, str]]:
+    async def build_session_content(sid: str, phone: str) -> list[dict[str, str]]:
         """
         🏗️ 构建会话的完整内容，包括消息和文件状态
         
@@ -460,14 +541,15 @@ class MessageHandler:
         """
         try:
             # 🔍 验证会话ID
-            uuid.UUID(str(sid))
             sid_str = str(sid)
+            if not _is_uuid(sid_str):
+                raise ValueError(f"无效的会话ID: {sid}")
             
-            # 📋 获取所有消息
-            messages = chat_management.chat_manager.get_messages(sid_str)
-            
-            # 📋 获取文件状态
-            file_status = file_processing.file_processor.get_session_file_status(sid_str)
+            # 📋 并发获取所有消息和文件状态
+            messages, file_status = await asyncio.gather(
+                asyncio.to_thread(chat_management.chat_manager.get_messages, sid_str),
+                asyncio.to_thread(file_processing.file_processor.get_session_file_status, sid_str),
+            )
             
             # 🏗️ 构建完整内容
             content_list = []
@@ -494,14 +576,14 @@ class MessageHandler:
                 })
             
             logger.info(
-                f"🏗️ 构建会话内容完成: "
-                f"会话={sid_str}, 消息={len(messages)}, 文件={file_status['total']}"
+                "🏗️ 构建会话内容完成: 会话=%s, 消息=%s, 文件=%s",
+                sid_str, len(messages), file_status['total']
             )
             
             return content_list
             
         except Exception as e:
-            logger.error(f"❌ 构建会话内容失败: 会话={sid}, 错误={str(e)}")
+            logger.error("❌ 构建会话内容失败: 会话=%s, 错误=%s", sid, e)
             return [{"role": "system", "content": "加载会话内容时出错"}]
 
 
@@ -509,7 +591,92 @@ class FileUploadHandler:
     """📁 文件上传处理器 - 处理用户上传的文件"""
 
     @staticmethod
-    def handle_file_upload(
+    def _process_single_file(
+        idx: int,
+        file_data: Any,
+        phone: str,
+        sid: str
+    ) -> tuple[bool, str, list[tuple[str, str]]]:
+        """
+        📄 处理单个上传文件：校验格式 → 保存到本地 → 向量化存储
+        
+        参数:
+            idx: 文件序号（从0开始，仅用于日志）
+            file_data: Gradio上传的文件对象
+            phone: 用户手机号
+            sid: 会话ID (UUID格式)
+            
+        返回:
+            元组：(是否成功, 文件名, 需要写入会话的状态消息 [(角色, 内容), ...])
+        """
+        try:
+            # 🔍 获取文件名
+            if hasattr(file_data, 'name'):
+                original_filename = str(Path(file_data.name).name)
+            elif hasattr(file_data, 'orig_name'):
+                original_filename = str(Path(file_data.orig_name).name)
+            else:
+                original_filename = str(file_data).split('/')[-1]
+            
+            # 🧹 使用清理后的文件名
+            original_filename = file_processing.file_processor.sanitize_filename(original_filename)
+            file_type = Path(original_filename).suffix.lower().lstrip(".")
+            
+            logger.info("🔍 处理第%s个文件: %s", idx + 1, original_filename)
+            
+            # 🛡️ 文件类型验证
+            if file_type not in _SUPPORTED_FORMATS:
+                error_msg = f"❌ 不支持的文件格式: {file_type}"
+                return False, original_filename, [("system", error_msg)]
+            
+            # 📁 保存文件到本地
+            try:
+                file_path = file_processing.file_processor.save_file(
+                    file_data, 
+                    phone, 
+                    sid
+                )
+                
+                if not file_path or not Path(file_path).exists():
+                    raise ValueError("文件保存失败")
+            
+            except Exception as save_error:
+                logger.error("❌ 文件保存异常: %s", save_error)
+                fail_msg = f"❌ 文件保存失败: {original_filename}"
+                return False, original_filename, [("system", fail_msg)]
+            
+            # 🔄 处理文件（向量化存储），处理过程中的状态消息收集后由调用方统一保存
+            status_messages = []
+            try:
+                success = file_processing.file_processor.process_file(
+                    sid, 
+                    Path(file_path), 
+                    original_filename, 
+                    file_type,
+                    messages=status_messages
+                )
+                
+                if success:
+                    success_msg = f"✅ 文件处理完成: {original_filename}"
+                    status_messages.append(("assistant", success_msg))
+                    return True, original_filename, status_messages
+                
+                fail_msg = f"❌ 文件处理失败: {original_filename}"
+                status_messages.append(("system", fail_msg))
+                return False, original_filename, status_messages
+            
+            except Exception as process_error:
+                logger.error("❌ 文件处理异常: %s", process_error)
+                fail_msg = f"❌ 文件处理异常: {original_filename}"
+                status_messages.append(("system", fail_msg))
+                return False, original_filename, status_messages
+        
+        except Exception as e:
+            logger.error("💥 第%s个文件总体异常: %s", idx + 1, e)
+            return False, str(file_data), []
+
+    @staticmethod
+    async def handle_file_upload(
         files: list[Any], 
         phone: str, 
         sid: str, 
@@ -517,6 +684,7 @@ class FileUploadHandler:
     ) -> tuple[list[dict[str, str]], str, Any]:
         """
         📁 处理文件上传 - 修复参数验证和错误处理
+        多个文件在线程池中并发处理（并发数受 config.MAX_UPLOAD_CONCURRENCY 限制）
         
         参数:
             files: Gradio上传的文件列表
@@ -532,105 +700,67 @@ class FileUploadHandler:
             phone = str(phone).strip() if phone else ""
             actual_sid = str(sid).strip() if sid else ""
             
-            logger.info(f"📁 开始处理文件上传: 用户={phone}, 会话={actual_sid}, 文件数={len(files)}")
+            logger.info("📁 开始处理文件上传: 用户=%s, 会话=%s, 文件数=%s", phone, actual_sid, len(files))
             
             # 🔍 参数验证
-            if not phone or not phone.isdigit() or len(phone) != 11:
+            if not _PHONE_RE.match(phone):
                 error_msg = "❌ 无效的手机号参数"
                 logger.error(error_msg)
                 return chat_history, actual_sid, gr.update()
                 
+            # 📋 界面上的聊天历史即当前会话的记录，状态消息在其基础上追加
+            base_history = list(chat_history or [])
+            
             # 🔍 会话ID验证 - 确保是有效的UUID
-            try:
-                uuid.UUID(actual_sid)
-            except (ValueError, TypeError):
+            if not _is_uuid(actual_sid):
                 logger.warning("⚠️ 无效的会话ID格式，创建新会话")
-                actual_sid = chat_management.chat_manager.create_session(phone, "文件上传会话")
+                actual_sid = await asyncio.to_thread(
+                    chat_management.chat_manager.create_session, phone, "文件上传会话"
+                )
+                base_history = _rows_to_history(await asyncio.to_thread(
+                    chat_management.chat_manager.get_messages, actual_sid
+                ))
             
             if not files or not isinstance(files, (list, tuple)):
                 logger.warning("⚠️ 无效的文件列表")
                 return chat_history, actual_sid, gr.update()
             
+            # 🚦 限制同时处理的文件数，避免嵌入计算占满资源
+            semaphore = asyncio.Semaphore(config.MAX_UPLOAD_CONCURRENCY)
+            
+            async def process_one(idx: int, file_data: Any):
+                async with semaphore:
+                    return await asyncio.to_thread(
+                        FileUploadHandler._process_single_file, idx, file_data, phone, actual_sid
+                    )
+            
+            # 📁 并发处理所有文件 (结果顺序与上传顺序一致)
+            results = await asyncio.gather(
+                *(process_one(idx, file_data) for idx, file_data in enumerate(files)),
+                return_exceptions=True
+            )
+            
             processed_count = 0
             failed_files = []
+            # 💾 待写入的状态消息，汇总后一次事务批量保存
+            pending = []
             
-            # 📁 逐个处理文件
-            for idx, file_data in enumerate(files):
-                try:
-                    # 🔍 获取文件名
-                    if hasattr(file_data, 'name'):
-                        original_filename = str(Path(file_data.name).name)
-                    elif hasattr(file_data, 'orig_name'):
-                        original_filename = str(Path(file_data.orig_name).name)
-                    else:
-                        original_filename = str(file_data).split('/')[-1]
-                    
-                    # 🧹 使用清理后的文件名
-                    original_filename = file_processing.file_processor.sanitize_filename(original_filename)
-                    file_type = Path(original_filename).suffix.lower().lstrip(".")
-                    
-                    logger.info(f"🔍 处理第{idx + 1}个文件: {original_filename}")
-                    
-                    # 🛡️ 文件类型验证
-                    if file_type not in config.SUPPORTED_FILE_FORMATS:
-                        error_msg = f"❌ 不支持的文件格式: {file_type}"
-                        chat_management.chat_manager.add_message(actual_sid, "system", error_msg)
-                        failed_files.append(original_filename)
-                        continue
-                    
-                    # 📁 保存文件到本地
-                    try:
-                        file_path = file_processing.file_processor.save_file(
-                            file_data, 
-                            phone, 
-                            actual_sid
-                        )
-                        
-                        if not file_path or not Path(file_path).exists():
-                            raise ValueError("文件保存失败")
-                    
-                    except Exception as save_error:
-                        logger.error(f"❌ 文件保存异常: {save_error}")
-                        fail_msg = f"❌ 文件保存失败: {original_filename}"
-                        chat_management.chat_manager.add_message(actual_sid, "system", fail_msg)
-                        failed_files.append(original_filename)
-                        continue
-                    
-                    # 🔄 处理文件（向量化存储）
-                    try:
-                        success = file_processing.file_processor.process_file(
-                            actual_sid, 
-                            Path(file_path), 
-                            original_filename, 
-                            file_type
-                        )
-                        
-                        if success:
-                            processed_count += 1
-                            success_msg = f"✅ 文件处理完成: {original_filename}"
-                            chat_management.chat_manager.add_message(actual_sid, "assistant", success_msg)
-                        else:
-                            failed_files.append(original_filename)
-                            fail_msg = f"❌ 文件处理失败: {original_filename}"
-                            chat_management.chat_manager.add_message(actual_sid, "system", fail_msg)
-                    
-                    except Exception as process_error:
-                        logger.error(f"❌ 文件处理异常: {process_error}")
-                        fail_msg = f"❌ 文件处理异常: {original_filename}"
-                        chat_management.chat_manager.add_message(actual_sid, "system", fail_msg)
-                        failed_files.append(original_filename)
-                
-                except Exception as e:
-                    logger.error(f"💥 第{idx + 1}个文件总体异常: {str(e)}")
+            def add_status(role: str, msg: str) -> None:
+                pending.append((actual_sid, role, msg, datetime.datetime.now().isoformat()))
+            
+            for file_data, result in zip(files, results):
+                if isinstance(result, BaseException):
+                    logger.error("💥 文件处理任务异常: %s", result)
                     failed_files.append(str(file_data))
                     continue
-            
-            # 📋 获取最新聊天记录
-            messages = chat_management.chat_manager.get_messages(actual_sid)
-            new_history = [
-                {"role": role, "content": content} 
-                for role, content, _ in messages
-            ]
+                
+                success, filename, status_messages = result
+                if success:
+                    processed_count += 1
+                else:
+                    failed_files.append(filename)
+                for role, msg in status_messages:
+                    add_status(role, msg)
             
             # 📊 生成处理总结
             if processed_count > 0 or failed_files:
@@ -642,23 +772,31 @@ class FileUploadHandler:
                 
                 summary_msg = " | ".join(summary_parts)
                 if summary_msg:
-                    chat_management.chat_manager.add_message(actual_sid, "assistant", summary_msg)
+                    add_status("assistant", summary_msg)
+            
+            # 💾 一次事务保存全部状态消息
+            await asyncio.to_thread(chat_management.chat_manager.add_messages_bulk, pending)
+            
+            # 📋 在界面历史上追加本次的状态消息，无需重新查询数据库
+            new_history = base_history + [
+                {"role": role, "content": content} for _, role, content, _ in pending
+            ]
             
             logger.info(
-                f"📊 文件上传完成: 用户={phone}, 会话={actual_sid}, "
-                f"成功={processed_count}, 失败={len(failed_files)}"
+                "📊 文件上传完成: 用户=%s, 会话=%s, 成功=%s, 失败=%s",
+                phone, actual_sid, processed_count, len(failed_files)
             )
             
             # 🔄 刷新左侧会话列表
-            session_update = SessionManager.refresh_session_list(phone)
+            session_update = await SessionManager.refresh_session_list(phone)
             
             return new_history, actual_sid, session_update
             
         except Exception as e:
-            logger.error(f"❌ 文件上传处理总体失败: {str(e)}")
+            logger.error("❌ 文件上传处理总体失败: %s", e)
             # 🔄 无论如何都尝试刷新会话列表
             try:
-                session_update = SessionManager.refresh_session_list(str(phone))
+                session_update = await SessionManager.refresh_session_list(str(phone))
             except:
                 session_update = gr.update()
             return chat_history, str(sid), session_update
@@ -678,7 +816,7 @@ class VerificationManager:
         env: "dev" | "prod"
         """
         self.env = env.lower()
-        logger.info(f"🔑 [VerificationManager] 初始化验证码管理器，环境={self.env}")
+        logger.info("🔑 [VerificationManager] 初始化验证码管理器，环境=%s", self.env)
 
     def send_code(self, phone: str, code_dict: dict[str, str]) -> bool:
         """
@@ -689,33 +827,33 @@ class VerificationManager:
 
         if self.env == "dev":
             # 💻 开发环境：直接生成并存入字典，控制台打印
-            logger.info(f"💻 [DEV] 验证码已生成 → 📱 {phone}: 🔑 {code}")
+            logger.info("💻 [DEV] 验证码已生成 → 📱 %s: 🔑 %s", phone, code)
             code_dict[phone] = code
             return True
 
         elif self.env == "prod":
             # 🚀 正式环境：调用真实接码平台
             try:
-                logger.info(f"🚀 [PROD] 正在调用接码平台 → 📱 {phone}")
+                logger.info("🚀 [PROD] 正在调用接码平台 → 📱 %s", phone)
                 success = self._send_via_sms_platform(phone, code)
                 if success:
                     code_dict[phone] = code
-                    logger.info(f"✅ [PROD] 接码平台返回成功 → 📱 {phone}: 🔑 {code}")
+                    logger.info("✅ [PROD] 接码平台返回成功 → 📱 %s: 🔑 %s", phone, code)
                 else:
-                    logger.error(f"❌ [PROD] 接码平台返回失败 → 📱 {phone}")
+                    logger.error("❌ [PROD] 接码平台返回失败 → 📱 %s", phone)
                 return success
             except Exception as e:
-                logger.error(f"💥 [PROD] 接码平台异常 → 📱 {phone}: {e}")
+                logger.error("💥 [PROD] 接码平台异常 → 📱 %s: %s", phone, e)
                 return False
 
         else:
-            logger.error(f"❌ [VerificationManager] 未知环境配置: {self.env}")
+            logger.error("❌ [VerificationManager] 未知环境配置: %s", self.env)
             return False
 
     def _generate_code(self) -> str:
         """🔢 生成 4 位数字验证码"""
-        code = f"{random.randint(1000, 9999)}"
-        logger.debug(f"🔢 生成验证码: {code}")
+        code = f"{secrets.randbelow(9000) + 1000}"
+        logger.debug("🔢 生成验证码: %s", code)
         return code
 
     def _send_via_sms_platform(self, phone: str, code: str) -> bool:
@@ -724,7 +862,7 @@ class VerificationManager:
         这里可以替换成任意 SMS 服务商 SDK
         """
         # 📝 替换为真实的短信发送逻辑
-        logger.info(f"📱 [SMS_STUB] 假设已发送短信 → 📱 {phone} 验证码 🔑 {code}")
+        logger.info("📱 [SMS_STUB] 假设已发送短信 → 📱 %s 验证码 🔑 %s", phone, code)
         return True   # ✅ 演示默认成功
 
 
@@ -734,6 +872,7 @@ class AuthHandler:
     ver_manager = VerificationManager(env="dev")
 
     @staticmethod
+    @chat_management.request_scoped
     def handle_login(phone: str, password: str) -> tuple:
         """
         🔑 处理用户登录
@@ -745,13 +884,13 @@ class AuthHandler:
         返回:
             Gradio界面更新元组，包含完整的会话和消息数据
         """
-        logger.info(f"🔑 开始处理用户登录: {phone}")
+        logger.info("🔑 开始处理用户登录: %s", phone)
         
         # 👤 获取用户信息
         user = db_manager.get_user(phone)
         if not user:
-            logger.warning(f"⚠️ 手机号未注册: {phone}")
-            return (gr.update(),) * 12 + (
+            logger.warning("⚠️ 手机号未注册: %s", phone)
+            return _NOOP_12 + (
                 gr.update(value="<div style='color: #dc3545;'>❌ 该手机号未注册，请先去注册</div>"),
             )
 
@@ -759,8 +898,8 @@ class AuthHandler:
         phone_db, pwd_db, name_db, role_db = user
 
         if pwd_db != password:
-            logger.warning(f"⚠️ 密码错误: {phone}")
-            return (gr.update(),) * 12 + (
+            logger.warning("⚠️ 密码错误: %s", phone)
+            return _NOOP_12 + (
                 gr.update(value="<div style='color: #dc3545;'>❌ 密码错误</div>"),
             )
 
@@ -778,25 +917,22 @@ class AuthHandler:
                 user_data["default_sid"] = chat_management.chat_manager.create_session(phone, "欢迎使用")
                 user_data = chat_management.chat_manager.ensure_all_sessions_loaded(phone)
             
-            # 📋 获取默认会话的消息
-            messages = chat_management.chat_manager.get_messages(
-                user_data["default_sid"], 
-                limit=None
-            )
-            history = [{"role": role, "content": content} for role, content, _ in messages]
+            # 📋 默认会话的消息已随会话数据一起加载
+            _latest_sid[phone] = user_data["default_sid"]
+            messages = user_data["messages_by_sid"][user_data["default_sid"]]
+            history = _rows_to_history(messages)
             
             logger.info(
-                f"🎉 用户登录成功: {phone}, "
-                f"会话总数={user_data['total_sessions']}, "
-                f"消息总数={user_data['total_messages']}"
+                "🎉 用户登录成功: %s, 会话总数=%s, 消息总数=%s",
+                phone, user_data['total_sessions'], user_data['total_messages']
             )
 
             # 🎯 获取用户角色
             user_role = "管理员" if role_db == 1 else "普通用户"
 
             return (
-                gr.update(visible=False),  # 隐藏登录页
-                gr.update(visible=False),  # 隐藏注册页
+                _HIDE,                     # 隐藏登录页
+                _HIDE,                     # 隐藏注册页
                 gr.update(visible=True),   # 显示聊天页
                 phone,                     # 当前用户手机号
                 user_data["default_sid"],  # 默认会话ID
@@ -805,24 +941,25 @@ class AuthHandler:
                 user_data["default_sid"],  # 当前选中的会话
                 history,                   # 聊天历史
                 gr.update(value=""),       # 清空登录提示
-                gr.update(visible=False),  # 隐藏后续问题按钮1
-                gr.update(visible=False),  # 隐藏后续问题按钮2
-                gr.update(visible=False),  # 隐藏后续问题按钮3
+                _HIDE,                     # 隐藏后续问题按钮1
+                _HIDE,                     # 隐藏后续问题按钮2
+                _HIDE,                     # 隐藏后续问题按钮3
             )
         
         except Exception as e:
-            logger.error(f"❌ 登录后数据加载失败: {str(e)}")
+            logger.error("❌ 登录后数据加载失败: %s", e)
             # 🆕 创建基础会话作为后备
             fallback_sid = chat_management.chat_manager.create_session(phone, "欢迎使用")
-            messages = chat_management.chat_manager.get_messages(fallback_sid)
-            history = [{"role": role, "content": content} for role, content, _ in messages]
+            _latest_sid[phone] = fallback_sid
+            messages = chat_management.chat_manager.get_messages_cached(fallback_sid)
+            history = _rows_to_history(messages)
             
             # 🔄 刷新会话列表
             session_choices = SessionManager.build_session_choices(phone)
             
             return (
-                gr.update(visible=False),
-                gr.update(visible=False),
+                _HIDE,
+                _HIDE,
                 gr.update(visible=True),
                 phone,
                 fallback_sid,
@@ -831,13 +968,14 @@ class AuthHandler:
                 fallback_sid,
                 history,
                 gr.update(value=""),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
+                _HIDE,
+                _HIDE,
+                _HIDE,
             )
 
 
     @staticmethod
+    @chat_management.request_scoped
     def handle_register(
         name: str, 
         phone: str, 
@@ -858,18 +996,18 @@ class AuthHandler:
         返回:
             Gradio界面更新元组，包含新会话和欢迎消息
         """
-        logger.info(f"📝 开始处理用户注册: {phone}")
+        logger.info("📝 开始处理用户注册: %s", phone)
 
         # 🔍 验证验证码
         if not code:
-            return (gr.update(),) * 12 + (
+            return _NOOP_12 + (
                 gr.update(value="<div style='color: #dc3545;'>❌ 请输入验证码</div>"),
                 gr.update(),
             )
         
         stored_code = codes_dict.get(phone, "")
         if not stored_code or code != stored_code:
-            return (gr.update(),) * 12 + (
+            return _NOOP_12 + (
                 gr.update(value="<div style='color: #dc3545;'>❌ 验证码错误或已过期</div>"),
                 gr.update(),
             )
@@ -877,7 +1015,7 @@ class AuthHandler:
         # ✅ 验证码正确，从字典中移除
         if phone in codes_dict:
             del codes_dict[phone]
-            logger.info(f"🔑 [AuthHandler] 验证码已使用并移除")
+            logger.info("🔑 [AuthHandler] 验证码已使用并移除")
         
         # 📝 注册用户（会自动创建默认会话）
         success, message = user_management.user_manager.register(phone, password, name)
@@ -897,24 +1035,21 @@ class AuthHandler:
                     user_data["default_sid"] = chat_management.chat_manager.create_session(phone, "欢迎使用")
                     user_data = chat_management.chat_manager.ensure_all_sessions_loaded(phone)
                 
-                # 📋 获取默认会话的消息
-                messages = chat_management.chat_manager.get_messages(
-                    user_data["default_sid"], 
-                    limit=None
-                )
-                history = [{"role": role, "content": content} for role, content, _ in messages]
+                # 📋 默认会话的消息已随会话数据一起加载
+                _latest_sid[phone] = user_data["default_sid"]
+                messages = user_data["messages_by_sid"][user_data["default_sid"]]
+                history = _rows_to_history(messages)
                 
                 logger.info(
-                    f"🎊 用户注册成功: {phone}, "
-                    f"创建会话={user_data['total_sessions']}, "
-                    f"消息={user_data['total_messages']}"
+                    "🎊 用户注册成功: %s, 创建会话=%s, 消息=%s",
+                    phone, user_data['total_sessions'], user_data['total_messages']
                 )
                 # ✅ 注册成功后立即刷新会话列表
                 session_choices = SessionManager.build_session_choices(phone)
                 
                 return (
-                    gr.update(visible=False),  # 🙈 隐藏登录页
-                    gr.update(visible=False),  # 🙈 隐藏注册页
+                    _HIDE,                     # 🙈 隐藏登录页
+                    _HIDE,                     # 🙈 隐藏注册页
                     gr.update(visible=True),   # 👁️ 显示聊天页
                     phone,                     # 📱 当前用户手机号
                     user_data["default_sid"],  # 🆔 默认会话ID
@@ -923,24 +1058,25 @@ class AuthHandler:
                     user_data["default_sid"],  # 🎯 当前选中的会话
                     history,                   # 💬 聊天历史（所有消息）
                     gr.update(value=""),       # 🧹 清空注册提示
-                    gr.update(visible=False),  # 🙈 隐藏后续问题按钮1
-                    gr.update(visible=False),  # 🙈 隐藏后续问题按钮2
-                    gr.update(visible=False),  # 🙈 隐藏后续问题按钮3
+                    _HIDE,                     # 🙈 隐藏后续问题按钮1
+                    _HIDE,                     # 🙈 隐藏后续问题按钮2
+                    _HIDE,                     # 🙈 隐藏后续问题按钮3
                 )
                 
             except Exception as e:
-                logger.error(f"❌ 注册后数据加载失败: {str(e)}")
+                logger.error("❌ 注册后数据加载失败: %s", e)
                 # 🆕 创建基础会话作为后备
                 fallback_sid = chat_management.chat_manager.create_session(phone, "欢迎使用")
-                messages = chat_management.chat_manager.get_messages(fallback_sid)
-                history = [{"role": role, "content": content} for role, content, _ in messages]
+                _latest_sid[phone] = fallback_sid
+                messages = chat_management.chat_manager.get_messages_cached(fallback_sid)
+                history = _rows_to_history(messages)
                 
                 # ✅ 立即刷新会话列表
                 session_choices = SessionManager.build_session_choices(phone)
                 
                 return (
-                    gr.update(visible=False),
-                    gr.update(visible=False),
+                    _HIDE,
+                    _HIDE,
                     gr.update(visible=True),
                     phone,
                     fallback_sid,
@@ -949,14 +1085,14 @@ class AuthHandler:
                     fallback_sid,
                     history,
                     gr.update(value=""),
-                    gr.update(visible=False),
-                    gr.update(visible=False),
-                    gr.update(visible=False),
+                    _HIDE,
+                    _HIDE,
+                    _HIDE,
                 )
 
         # ❌ 注册失败
-        logger.warning(f"❌ 注册失败: {phone} - {message}")
-        return (gr.update(),) * 12 + (
+        logger.warning("❌ 注册失败: %s - %s", phone, message)
+        return _NOOP_12 + (
             gr.update(value=f"<div style='color: #dc3545;'>❌ {message}</div>"),
         )
 
@@ -996,8 +1132,8 @@ class AuthHandler:
             # 🔄 完整的界面重置状态（13个组件）
             return (
                 gr.update(visible=True),                     # [1] 显示登录页
-                gr.update(visible=False),                    # [2] 隐藏注册页
-                gr.update(visible=False),                    # [3] 隐藏聊天页
+                _HIDE,                                       # [2] 隐藏注册页
+                _HIDE,                                       # [3] 隐藏聊天页
                 gr.update(value=""),                         # [4] 清空当前用户手机号
                 gr.update(value=""),                         # [5] 清空当前会话ID
                 gr.update(value=""),                         # [6] 清空用户显示信息
@@ -1005,20 +1141,20 @@ class AuthHandler:
                 gr.update(choices=[], value=None, interactive=False),  # [8] 关键：清空会话列表并禁用
                 gr.update(value=None),                       # [9] 确保会话选择器无值
                 gr.update(value=exit_success_msg),           # [10] 显示退出成功消息
-                gr.update(visible=False),                    # [11] 隐藏后续问题按钮1
-                gr.update(visible=False),                    # [12] 隐藏后续问题按钮2
-                gr.update(visible=False),                    # [13] 隐藏后续问题按钮3
+                _HIDE,                                       # [11] 隐藏后续问题按钮1
+                _HIDE,                                       # [12] 隐藏后续问题按钮2
+                _HIDE,                                       # [13] 隐藏后续问题按钮3
             )
             
         except Exception as e:
             # ❌ 错误兜底处理 - 确保界面总能正确重置
-            logger.error(f"❌ 退出登录异常: {str(e)} - 执行兜底重置")
+            logger.error("❌ 退出登录异常: %s - 执行兜底重置", e)
             
             # 🛡️ 安全兜底：无论如何都要重置界面
             return (
                 gr.update(visible=True),                     # [1] 显示登录页
-                gr.update(visible=False),                    # [2] 隐藏注册页
-                gr.update(visible=False),                    # [3] 隐藏聊天页
+                _HIDE,                                       # [2] 隐藏注册页
+                _HIDE,                                       # [3] 隐藏聊天页
                 gr.update(value=""),                         # [4] 清空当前用户手机号
                 gr.update(value=""),                         # [5] 清空当前会话ID
                 gr.update(value=""),                         # [6] 清空用户显示信息
@@ -1026,9 +1162,9 @@ class AuthHandler:
                 gr.update(choices=[], value=None, interactive=False),  # [8] 关键：清空会话列表
                 gr.update(value=None),                       # [9] 确保会话选择器无值
                 gr.update(value="<div style='color: #dc3545;'>⚠️ 退出完成（遇到小问题，但已安全登出）</div>"),
-                gr.update(visible=False),                    # [11] 隐藏后续问题按钮1
-                gr.update(visible=False),                    # [12] 隐藏后续问题按钮2
-                gr.update(visible=False),                    # [13] 隐藏后续问题按钮3
+                _HIDE,                                       # [11] 隐藏后续问题按钮1
+                _HIDE,                                       # [12] 隐藏后续问题按钮2
+                _HIDE,                                       # [13] 隐藏后续问题按钮3
             )
 
     @staticmethod
@@ -1049,7 +1185,7 @@ class AuthHandler:
         
         # 📝 记录退出时间
         exit_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"📊 用户退出登录时间: {exit_time}")
+        logger.info("📊 用户退出登录时间: %s", exit_time)
         
         # 🔄 使用主退出逻辑
         return AuthHandler.handle_logout()
@@ -1,10 +1,17 @@
 import sqlite3
+import json
 import uuid
 from pathlib import Path
 from datetime import datetime
 from config import config
 from utils.logger import logger
 
+# 📊 知识条目低质量阈值 (部分索引 idx_low_quality 的谓词常量，查询需使用同一字面值)
+LOW_QUALITY_THRESHOLD = 0.7
+
+# ✏️ update_knowledge_fields 按列更新的字段，其余键写入 extra_json
+KNOWLEDGE_ENTRY_FIELDS = frozenset(["title", "author", "tags", "category", "description", "content_summary"])
+
 
 class DatabaseManager:
     """
@@ -44,6 +51,17 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         try:
+            if self._is_file_db():
+                # 🧹 增量自动清理：只能在建表前设定，已有数据库需 VACUUM 后才会切换
+                if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 0:
+                    if cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+                        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    else:
+                        logger.info("ℹ️ 现有数据库未启用 auto_vacuum，执行一次 VACUUM 后增量清理才会生效")
+                
+                # ⚡ WAL日志模式 (写入数据库文件头，对之后的所有连接持久生效)
+                cursor.execute("PRAGMA journal_mode=WAL")
+            
             # ================================= 用户表 =================================
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -106,9 +124,15 @@ class DatabaseManager:
                     reviewed_at TEXT,                       -- 审核时间 (ISO格式)
                     description TEXT,                       -- 描述
                     content_summary TEXT,                   -- 内容摘要
-                    category TEXT                           -- 分类字段
+                    category TEXT,                          -- 分类字段
+                    quality_score REAL,                     -- 质量评分 (0-1)
+                    last_quality_check TEXT,                -- 最近一次质量评估时间 (ISO格式)
+                    extra_json TEXT                         -- 其余自定义字段 (JSON)
                 )
             ''')
+            self._ensure_column(cursor, "knowledge_entries", "quality_score", "REAL")
+            self._ensure_column(cursor, "knowledge_entries", "last_quality_check", "TEXT")
+            self._ensure_column(cursor, "knowledge_entries", "extra_json", "TEXT")
             
             # ================================= 知识库权限表 =================================
             cursor.execute('''
@@ -139,12 +163,39 @@ class DatabaseManager:
                     size INTEGER                           -- 备份文件大小 (字节)
                 )
             ''')
+            self._ensure_column(cursor, "system_backups", "checksum", "TEXT")  # 备份文件校验和 ("算法:十六进制摘要")
+            
+            # ================================= 知识库文件表 =================================
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS kb_files (
+                    file_id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 文件ID (向量块元数据中引用)
+                    file_path TEXT NOT NULL UNIQUE,         -- 文件路径
+                    file_type TEXT NOT NULL,                -- 文件类型 (pdf, docx等)
+                    source TEXT,                            -- 来源 (标题)
+                    author TEXT,                            -- 作者
+                    tags TEXT,                              -- 标签 (逗号分隔)
+                    extra_json TEXT                         -- 其余自定义元数据 (JSON)
+                )
+            ''')
+            
+            # ================================= 知识库块索引表 =================================
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS kb_file_chunks (
+                    file_path TEXT NOT NULL,                -- 文件路径
+                    chunk_id TEXT NOT NULL,                 -- 向量库中的块ID
+                    PRIMARY KEY (file_path, chunk_id)
+                )
+            ''')
             
             # ================================= 索引优化 =================================
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_phone ON sessions(phone)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_sid ON messages(sid)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_sid ON files(sid)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_knowledge_status ON knowledge_entries(status)')
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_low_quality ON knowledge_entries(quality_score) "
+                f"WHERE status = 'approved' AND quality_score < {LOW_QUALITY_THRESHOLD}"
+            )
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_knowledge_permissions ON knowledge_permissions(entry_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_system_alerts_level ON system_alerts(level)')
             
@@ -383,6 +434,38 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def add_messages_bulk(self, messages: list[tuple[str, str, str, str]]) -> int:
+        """
+        ➕ 批量添加消息 (单个事务提交)
+        
+        参数:
+            messages: (会话ID, 消息角色, 消息内容, 时间戳) 列表
+        返回:
+            写入的消息数量 (失败时为0)
+        """
+        if not messages:
+            return 0
+        
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.executemany(
+                "INSERT INTO messages(sid, role, content, ts) VALUES(?, ?, ?, ?)",
+                messages
+            )
+            conn.commit()
+            
+            logger.info(f"✅ 消息批量添加成功: {len(messages)} 条")
+            return len(messages)
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 批量添加消息失败: {str(e)}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+
     def get_messages(self, sid: str, limit: int | None = None) -> list[tuple]:
         """
         🔍 获取会话消息
@@ -626,12 +709,12 @@ class DatabaseManager:
             
             if status:
                 cursor.execute(
-                    "SELECT id, file_name, title, author, tags, status, created_at, category FROM knowledge_entries WHERE status = ? ORDER BY created_at DESC",
+                    "SELECT id, file_name, title, author, tags, status, created_at, category, description FROM knowledge_entries WHERE status = ? ORDER BY created_at DESC",
                     (status,)
                 )
             else:
                 cursor.execute(
-                    "SELECT id, file_name, title, author, tags, status, created_at, category FROM knowledge_entries ORDER BY created_at DESC"
+                    "SELECT id, file_name, title, author, tags, status, created_at, category, description FROM knowledge_entries ORDER BY created_at DESC"
                 )
                 
             rows = cursor.fetchall()
@@ -646,7 +729,8 @@ class DatabaseManager:
                     "tags": row[4],
                     "status": row[5],
                     "created_at": row[6],
-                    "category": row[7]
+                    "category": row[7],
+                    "description": row[8]
                 })
                 
             logger.info(f"✅ 获取知识条目成功: {len(entries)} 条")
@@ -658,6 +742,65 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def get_stale_quality_entries(self) -> list[dict]:
+        """
+        🔍 获取需要重新质量评估的已批准条目 (从未评估过，或评估后又被修改)
+        
+        返回:
+            条目列表
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """
+                SELECT id, title, author, description FROM knowledge_entries
+                WHERE status = 'approved'
+                  AND (last_quality_check IS NULL OR updated_at > last_quality_check)
+                """
+            )
+            
+            return [
+                {"id": row[0], "title": row[1], "author": row[2], "description": row[3]}
+                for row in cursor.fetchall()
+            ]
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取待评估知识条目失败: {str(e)}")
+            return []
+        finally:
+            conn.close()
+
+    def get_low_quality_entries(self) -> list[dict]:
+        """
+        🔍 获取质量评分低于阈值的已批准条目 (走 idx_low_quality 部分索引)
+        
+        返回:
+            条目列表
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                f"""
+                SELECT id, title, author, description, quality_score FROM knowledge_entries
+                WHERE status = 'approved' AND quality_score < {LOW_QUALITY_THRESHOLD}
+                """
+            )
+            
+            return [
+                {"id": row[0], "title": row[1], "author": row[2], "description": row[3], "quality_score": row[4]}
+                for row in cursor.fetchall()
+            ]
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取低质量知识条目失败: {str(e)}")
+            return []
+        finally:
+            conn.close()
+
     def update_knowledge_content(self, entry_id: int, new_content: str) -> bool:
         """
         ✏️ 更新知识条目内容
@@ -688,6 +831,63 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def update_knowledge_fields(self, entry_id: int, updates: dict) -> bool:
+        """
+        ✏️ 按列更新知识条目字段 (未提供的字段保持原值)
+        
+        参数:
+            entry_id: 条目ID
+            updates: 更新内容字典，title/author/tags/category/description/content_summary
+                     写入对应列，其余键以JSON形式写入 extra_json
+        返回:
+            是否成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            tags = updates.get("tags")
+            if isinstance(tags, (list, tuple)):
+                tags = ",".join(tags)
+            extra = {k: v for k, v in updates.items() if k not in KNOWLEDGE_ENTRY_FIELDS}
+            
+            cursor.execute(
+                """
+                UPDATE knowledge_entries SET
+                    title = COALESCE(?, title),
+                    author = COALESCE(?, author),
+                    tags = COALESCE(?, tags),
+                    category = COALESCE(?, category),
+                    description = COALESCE(?, description),
+                    content_summary = COALESCE(?, content_summary),
+                    extra_json = COALESCE(?, extra_json),
+                    updated_at = ?
+                WHERE id = ?
+                """,
+                (
+                    updates.get("title"),
+                    updates.get("author"),
+                    tags,
+                    updates.get("category"),
+                    updates.get("description"),
+                    updates.get("content_summary"),
+                    json.dumps(extra, ensure_ascii=False) if extra else None,
+                    datetime.now().isoformat(),
+                    entry_id
+                )
+            )
+            conn.commit()
+            
+            logger.info(f"✅ 知识条目字段更新成功: ID {entry_id}")
+            return cursor.rowcount > 0
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 更新知识条目字段失败: {str(e)}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
     def update_knowledge_status(self, entry_id: int, status: str) -> bool:
         """
         ✏️ 更新知识条目状态
@@ -840,6 +1040,277 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    # ================================ 知识库块索引方法 ================================
+
+    def upsert_kb_file(self, file_path: str, file_type: str, source: str, author: str, tags: str, extra: dict) -> int | None:
+        """
+        ➕ 添加或更新知识库文件元数据
+        
+        参数:
+            file_path: 文件路径
+            file_type: 文件类型 (pdf, docx等)
+            source: 来源 (标题)
+            author: 作者
+            tags: 标签 (逗号分隔)
+            extra: 其余自定义元数据
+        返回:
+            文件ID 或 None (失败)
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """
+                INSERT INTO kb_files(file_path, file_type, source, author, tags, extra_json)
+                VALUES(?, ?, ?, ?, ?, ?)
+                ON CONFLICT(file_path) DO UPDATE SET
+                    file_type = excluded.file_type, source = excluded.source, author = excluded.author,
+                    tags = excluded.tags, extra_json = excluded.extra_json
+                """,
+                (file_path, file_type, source, author, tags, json.dumps(extra, ensure_ascii=False, default=str))
+            )
+            cursor.execute("SELECT file_id FROM kb_files WHERE file_path = ?", (file_path,))
+            file_id = cursor.fetchone()[0]
+            conn.commit()
+            
+            logger.info(f"✅ 知识库文件记录成功: {file_path} (ID: {file_id})")
+            return file_id
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 记录知识库文件失败: {str(e)}")
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+
+    def ensure_kb_file(self, file_path: str, file_type: str) -> tuple[int, bool] | None:
+        """
+        🆔 获取知识库文件ID，文件不存在时创建仅含类型的记录 (已有记录的元数据不变)
+        
+        参数:
+            file_path: 文件路径
+            file_type: 文件类型 (pdf, docx等)
+        返回:
+            (文件ID, 是否新建) 或 None (失败)
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "INSERT OR IGNORE INTO kb_files(file_path, file_type) VALUES(?, ?)",
+                (file_path, file_type)
+            )
+            created = cursor.rowcount > 0
+            cursor.execute("SELECT file_id FROM kb_files WHERE file_path = ?", (file_path,))
+            file_id = cursor.fetchone()[0]
+            conn.commit()
+            
+            return file_id, created
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取知识库文件ID失败: {str(e)}")
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+
+    def get_kb_files(self, file_ids: list[int]) -> dict[int, dict]:
+        """
+        🔍 批量获取知识库文件元数据
+        
+        参数:
+            file_ids: 文件ID列表
+        返回:
+            {文件ID: 元数据字典}
+        """
+        if not file_ids:
+            return {}
+            
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            placeholders = ",".join(["?"] * len(file_ids))
+            cursor.execute(
+                f"SELECT file_id, file_path, source, author, tags, extra_json FROM kb_files WHERE file_id IN ({placeholders})",
+                list(file_ids)
+            )
+            
+            files = {}
+            for row in cursor.fetchall():
+                files[row[0]] = {
+                    "source": row[2],
+                    "author": row[3],
+                    "tags": row[4],
+                    "file_path": row[1],
+                    **json.loads(row[5] or "{}")
+                }
+            return files
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取知识库文件失败: {str(e)}")
+            return {}
+        finally:
+            conn.close()
+
+    def search_kb_files(self, keyword: str, limit: int) -> list[dict]:
+        """
+        🔍 按来源、作者或标签搜索知识库文件
+        
+        参数:
+            keyword: 搜索关键词
+            limit: 返回数量限制
+        返回:
+            文件列表
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            pattern = f"%{keyword}%"
+            cursor.execute(
+                "SELECT source, author, tags, file_path FROM kb_files WHERE source LIKE ? OR author LIKE ? OR tags LIKE ? LIMIT ?",
+                (pattern, pattern, pattern, limit)
+            )
+            
+            return [
+                {"source": row[0] or "", "author": row[1] or "", "tags": row[2] or "", "file_path": row[3]}
+                for row in cursor.fetchall()
+            ]
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 搜索知识库文件失败: {str(e)}")
+            return []
+        finally:
+            conn.close()
+
+    def set_kb_chunk_ids(self, file_path: str, chunk_ids: list[str]) -> bool:
+        """
+        🔄 记录文件对应的向量块ID (整体替换该文件原有的块索引)
+        
+        参数:
+            file_path: 文件路径
+            chunk_ids: 块ID列表
+        返回:
+            是否成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            # 🧹 删除旧索引与写入新索引在同一事务内完成
+            cursor.execute("DELETE FROM kb_file_chunks WHERE file_path = ?", (file_path,))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO kb_file_chunks(file_path, chunk_id) VALUES(?, ?)",
+                [(file_path, chunk_id) for chunk_id in chunk_ids]
+            )
+            conn.commit()
+            
+            logger.info(f"✅ 块索引记录成功: {file_path} -> {len(chunk_ids)} 个块")
+            return True
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 记录块索引失败: {str(e)}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def get_kb_chunk_ids(self, file_path: str) -> list[str]:
+        """
+        🔍 获取文件对应的向量块ID
+        
+        参数:
+            file_path: 文件路径
+        返回:
+            块ID列表
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT chunk_id FROM kb_file_chunks WHERE file_path = ?", (file_path,))
+            return [row[0] for row in cursor.fetchall()]
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取块索引失败: {str(e)}")
+            return []
+        finally:
+            conn.close()
+
+    def delete_kb_file(self, file_path: str) -> bool:
+        """
+        🗑️ 删除知识库文件记录及其块索引
+        
+        参数:
+            file_path: 文件路径
+        返回:
+            是否成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM kb_file_chunks WHERE file_path = ?", (file_path,))
+            cursor.execute("DELETE FROM kb_files WHERE file_path = ?", (file_path,))
+            conn.commit()
+            
+            logger.info(f"✅ 块索引删除成功: {file_path}")
+            return cursor.rowcount > 0
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 删除块索引失败: {str(e)}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def get_kb_statistics(self) -> dict | None:
+        """
+        📊 按文件类型和作者统计知识库块数
+        
+        返回:
+            {"total_chunks": 块数, "document_types": {类型: 块数}, "authors": {作者: 块数}} 或 None (失败)
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COUNT(*) FROM kb_file_chunks")
+            total_chunks = cursor.fetchone()[0]
+            
+            cursor.execute(
+                """
+                SELECT f.file_type, COUNT(*) FROM kb_file_chunks c
+                JOIN kb_files f ON f.file_path = c.file_path
+                GROUP BY f.file_type
+                """
+            )
+            doc_types = dict(cursor.fetchall())
+            
+            cursor.execute(
+                """
+                SELECT COALESCE(f.author, 'unknown'), COUNT(*) FROM kb_file_chunks c
+                JOIN kb_files f ON f.file_path = c.file_path
+                GROUP BY f.author
+                """
+            )
+            authors = dict(cursor.fetchall())
+            
+            return {
+                "total_chunks": total_chunks,
+                "document_types": doc_types,
+                "authors": authors
+            }
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取知识库统计失败: {str(e)}")
+            return None
+        finally:
+            conn.close()
+
     # ================================ 系统维护方法 ================================
 
     def add_system_alert(self, message: str, level: str = "warning") -> int | None:
@@ -873,6 +1344,38 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def add_system_alerts_bulk(self, alerts: list[tuple[str, str, str]]) -> int:
+        """
+        ➕ 批量添加系统告警 (单个事务提交)
+        
+        参数:
+            alerts: (告警消息, 告警级别, 创建时间) 列表
+        返回:
+            写入的告警数量 (失败时为0)
+        """
+        if not alerts:
+            return 0
+        
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.executemany(
+                "INSERT INTO system_alerts(message, level, created_at) VALUES(?, ?, ?)",
+                alerts
+            )
+            conn.commit()
+            
+            logger.info(f"✅ 系统告警批量添加成功: {len(alerts)} 条")
+            return len(alerts)
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 批量添加系统告警失败: {str(e)}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+
     def get_system_alerts(self, level: str | None = None, limit: int = 50) -> list[dict]:
         """
         🔍 获取系统告警
@@ -918,7 +1421,9 @@ class DatabaseManager:
         finally:
             conn.close()
 
-    def add_backup_record(self, backup_path: str, version: str | None = None, size: int | None = None) -> int | None:
+    def add_backup_record(
+        self, backup_path: str, version: str | None = None, size: int | None = None, checksum: str | None = None
+    ) -> int | None:
         """
         ➕ 添加备份记录
         
@@ -926,6 +1431,7 @@ class DatabaseManager:
             backup_path: 备份文件路径
             version: 系统版本
             size: 备份文件大小 (字节)
+            checksum: 备份文件校验和 (恢复前用于完整性校验)
         返回:
             新增备份ID 或 None (失败)
         """
@@ -934,8 +1440,8 @@ class DatabaseManager:
             cursor = conn.cursor()
             
             cursor.execute(
-                "INSERT INTO system_backups(backup_path, version, created_at, size) VALUES(?, ?, ?, ?)",
-                (backup_path, version, datetime.now().isoformat(), size)
+                "INSERT INTO system_backups(backup_path, version, created_at, size, checksum) VALUES(?, ?, ?, ?, ?)",
+                (backup_path, version, datetime.now().isoformat(), size, checksum)
             )
             conn.commit()
             
@@ -994,11 +1500,55 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def get_backup_checksum(self, backup_path: str) -> str | None:
+        """
+        🔍 获取备份文件记录的校验和
+        
+        参数:
+            backup_path: 备份文件路径
+        返回:
+            校验和 (没有记录或未记录校验和时为None)
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT checksum FROM system_backups WHERE backup_path = ? ORDER BY created_at DESC LIMIT 1",
+                (backup_path,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+            
+        except sqlite3.Error as e:
+            logger.error(f"❌ 获取备份校验和失败: {str(e)}")
+            return None
+        finally:
+            conn.close()
+
     # ================================ 辅助方法 ================================
 
     def get_connection(self) -> sqlite3.Connection:
         """获取数据库连接"""
-        return sqlite3.connect(self.db_path, check_same_thread=False)
+        # 📋 语句缓存加大到256条：长连接 (写连接/读连接池) 上的常用语句只编译一次
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        if self._is_file_db():
+            # ⚡ WAL + NORMAL: 应用崩溃不丢数据，仅断电可能丢失最后的事务，提交时不再每次fsync
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA journal_size_limit=67108864")
+        return conn
+
+    def _ensure_column(self, cursor: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+        """为旧版数据库补齐新增列 (列已存在时跳过)"""
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            logger.info(f"🔧 数据表 {table} 新增列: {column}")
+
+    def _is_file_db(self) -> bool:
+        """是否为文件数据库 (内存数据库不支持WAL)"""
+        return str(self.db_path) != ":memory:"
 
     def _create_directories(self) -> None:
         """创建必要的目录结构"""
@@ -22,7 +22,9 @@ class Logger:
     def __init__(self, name=__name__):
         # 🎯 创建日志记录器
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)  # 🎯 设置最低日志级别
+        file_level = getattr(logging, config.LOG_LEVEL.upper())
+        # 🎯 记录器级别取各处理器的最低级别，低于此级别的日志在调用处直接跳过 (isEnabledFor 判断有意义)
+        self.logger.setLevel(min(file_level, logging.INFO))
         
         # 🎨 日志格式
         formatter = logging.Formatter(
@@ -36,7 +38,7 @@ class Logger:
         
         # 📁 文件处理器 - 每天一个文件，最多保留7天
         file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-        file_handler.setLevel(getattr(logging, config.LOG_LEVEL.upper()))
+        file_handler.setLevel(file_level)
         file_handler.setFormatter(formatter)
         
         # ----------------------- 📺 控制台处理器 -----------------------